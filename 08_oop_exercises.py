@@ -18,16 +18,56 @@
 """
 
 import abc
+import asyncio
+import bisect
+import csv
+import heapq
+import io
+import itertools
 import json
+import mmap
+import multiprocessing
+import os
+import random
+import re
+import sqlite3
+import struct
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
 import uuid
+import zlib
+from array import array
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager, nullcontext
 from datetime import datetime, timedelta
 from typing import Protocol, List, Dict, Optional, Any, Type, runtime_checkable
-from collections import defaultdict
+from collections import Counter, OrderedDict, defaultdict, deque, namedtuple
+from collections.abc import Mapping
 import weakref
 import functools
 
+import numpy as np
 
-def exercise_01_library_management_system():
+
+# Шард ShardedLibrary внутри рабочего процесса (упражнение 1).
+# Функции должны быть на уровне модуля, чтобы задания пула процессов
+# сериализовались по ссылке; сам шард создаётся фабрикой при fork.
+_LIBRARY_SHARD = None
+
+
+def _init_library_shard(factory):
+    global _LIBRARY_SHARD
+    _LIBRARY_SHARD = factory()
+
+
+def _call_library_shard(method: str, *args):
+    return getattr(_LIBRARY_SHARD, method)(*args)
+
+
+def exercise_01_library_management_system(run_benchmarks: bool = False):
     """
     Упражнение 1: Система управления библиотекой
     
@@ -40,6 +80,9 @@ def exercise_01_library_management_system():
     5. Инкапсуляция с защищенными/приватными атрибутами
     6. Специальные методы (__str__, __eq__, __hash__)
     7. Валидация данных через properties
+    
+    Демонстрация запускает замеры на небольших данных; полные замеры
+    производительности выполняются только при run_benchmarks=True.
     """
     print("=== Упражнение 1: Система управления библиотекой ===")
     
@@ -58,10 +101,89 @@ def exercise_01_library_management_system():
         MAINTENANCE = "maintenance"
         LOST = "lost"
     
+    class ResultMessage:
+        """
+        Результат операции с отложенным текстом сообщения.
+        
+        Хранит шаблон и поля операции; строка формируется при первом
+        str() и запоминается, поэтому вызывающий, которому сообщение не
+        нужно, не платит за форматирование дат и строк. Сравнение со
+        строкой, хеш, длина, индексы, конкатенация и методы str работают
+        как у готовой строки; при передаче между процессами объект
+        становится обычной строкой.
+        """
+        
+        __slots__ = ('template', 'fields', '_text')
+        
+        def __init__(self, template: str, **fields):
+            self.template = template
+            self.fields = fields
+            self._text = None
+        
+        def __str__(self):
+            if self._text is None:
+                self._text = self.template.format(**self.fields)
+            return self._text
+        
+        def __repr__(self):
+            return repr(str(self))
+        
+        def __format__(self, format_spec):
+            return format(str(self), format_spec)
+        
+        def __getattr__(self, name):
+            # Сначала поля операции, затем методы строки (startswith, split, ...)
+            try:
+                return self.fields[name]
+            except KeyError:
+                return getattr(str(self), name)
+        
+        def __eq__(self, other):
+            if isinstance(other, (str, ResultMessage)):
+                return str(self) == str(other)
+            return NotImplemented
+        
+        def __hash__(self):
+            return hash(str(self))
+        
+        def __len__(self):
+            return len(str(self))
+        
+        def __getitem__(self, index):
+            return str(self)[index]
+        
+        def __iter__(self):
+            return iter(str(self))
+        
+        def __contains__(self, value):
+            return value in str(self)
+        
+        def __add__(self, other):
+            return str(self) + other
+        
+        def __radd__(self, other):
+            return other + str(self)
+        
+        def __reduce__(self):
+            return str, (str(self),)
+    
     class Item(ABC):
         """Абстрактный базовый класс для элементов библиотеки"""
         
+        # Без __dict__: атрибуты хранятся в фиксированных слотах экземпляра
+        __slots__ = ('_item_id', '_title', '_publisher', '_year', '_status',
+                     '_borrowed_by', '_borrowed_date', '_due_date', '_reserved_for',
+                     '_library')
+        
+        intern_publishers = True  # Flyweight: одинаковые издатели — один объект str
+        
+        # Шаблоны ResultMessage: дата форматируется только при выводе
+        _BORROW_MESSAGE = "Элемент '{item_title}' выдан {member_name} до {due_date:%d.%m.%Y}"
+        _RETURN_MESSAGE = "Элемент '{item_title}' возвращен от {member_name}"
+        
         def __init__(self, item_id: str, title: str, publisher: str, year: int):
+            if self.intern_publishers and isinstance(publisher, str):
+                publisher = sys.intern(publisher)
             self._item_id = item_id
             self._title = title
             self._publisher = publisher
@@ -70,6 +192,8 @@ def exercise_01_library_management_system():
             self._borrowed_by = None
             self._borrowed_date = None
             self._due_date = None
+            self._reserved_for = None  # Читатель, для которого элемент отложен
+            self._library = None  # Библиотека, которая индексирует элемент
         
         # Properties для контролируемого доступа
         @property
@@ -84,7 +208,10 @@ def exercise_01_library_management_system():
         def title(self, value):
             if not isinstance(value, str) or len(value.strip()) == 0:
                 raise ValueError("Название не может быть пустым")
+            old_title = self._title
             self._title = value.strip()
+            if self._library is not None:
+                self._library._on_item_title_changed(self, old_title)
         
         @property
         def year(self):
@@ -105,17 +232,26 @@ def exercise_01_library_management_system():
         def is_available(self):
             return self._status == ItemStatus.AVAILABLE
         
+        @property
+        def reserved_for(self):
+            return self._reserved_for
+        
         def borrow(self, member, days=14):
-            """Выдать элемент читателю"""
-            if not self.is_available:
+            """Выдать элемент читателю (отложенный — только тому, для кого отложен)"""
+            reserved_for_member = (self._status == ItemStatus.RESERVED
+                                   and self._reserved_for == member)
+            if not (self.is_available or reserved_for_member):
                 raise ValueError(f"Элемент недоступен для выдачи: {self._status.value}")
             
-            self._status = ItemStatus.BORROWED
+            self._reserved_for = None
             self._borrowed_by = member
             self._borrowed_date = datetime.now()
             self._due_date = self._borrowed_date + timedelta(days=days)
+            self._set_status(ItemStatus.BORROWED)
             
-            return f"Элемент '{self.title}' выдан {member.name} до {self._due_date.strftime('%d.%m.%Y')}"
+            return ResultMessage(self._BORROW_MESSAGE, item_id=self._item_id, item_title=self._title,
+                                 member_id=member.member_id, member_name=member.name,
+                                 due_date=self._due_date)
         
         def return_item(self):
             """Вернуть элемент"""
@@ -123,12 +259,34 @@ def exercise_01_library_management_system():
                 raise ValueError("Элемент не был выдан")
             
             member = self._borrowed_by
-            self._status = ItemStatus.AVAILABLE
             self._borrowed_by = None
             self._borrowed_date = None
             self._due_date = None
+            self._set_status(ItemStatus.AVAILABLE)
             
-            return f"Элемент '{self.title}' возвращен от {member.name}"
+            return ResultMessage(self._RETURN_MESSAGE, item_id=self._item_id, item_title=self._title,
+                                 member_id=member.member_id, member_name=member.name)
+        
+        def hold(self, member):
+            """Отложить доступный элемент для читателя из очереди резервов"""
+            if not self.is_available:
+                raise ValueError(f"Элемент нельзя отложить: {self._status.value}")
+            self._reserved_for = member
+            self._set_status(ItemStatus.RESERVED)
+        
+        def release_hold(self):
+            """Снять отложенный элемент с полки резервов"""
+            if self._status != ItemStatus.RESERVED:
+                raise ValueError("Элемент не был отложен")
+            self._reserved_for = None
+            self._set_status(ItemStatus.AVAILABLE)
+        
+        def _set_status(self, status):
+            """Сменить статус и уведомить библиотеку"""
+            old_status = self._status
+            self._status = status
+            if self._library is not None:
+                self._library._on_item_status_changed(self, old_status)
         
         def is_overdue(self):
             """Проверить просрочку"""
@@ -136,6 +294,10 @@ def exercise_01_library_management_system():
                 return datetime.now() > self._due_date
             return False
         
+        def get_search_fields(self):
+            """Поля, по которым элемент индексируется для поиска"""
+            return (self._title,)
+        
         @abstractmethod
         def get_loan_period(self):
             """Абстрактный метод для получения срока выдачи"""
@@ -159,10 +321,40 @@ def exercise_01_library_management_system():
         
         def __hash__(self):
             return hash(self._item_id)
+        
+        _snapshot_fields = ()  # Дополнительные атрибуты подкласса в снимке
+        
+        def to_record(self):
+            """Кортеж простых значений для двоичного снимка"""
+            return (type(self).__name__, self._item_id, self._title, self._publisher,
+                    self._year, self._status.value,
+                    self._borrowed_by.member_id if self._borrowed_by else None,
+                    self._borrowed_date.timestamp() if self._borrowed_date else None,
+                    self._due_date.timestamp() if self._due_date else None,
+                    self._reserved_for.member_id if self._reserved_for else None,
+                    *(getattr(self, name) for name in self._snapshot_fields))
+        
+        @staticmethod
+        def from_record(values):
+            """Создать элемент из записи снимка (читатели связываются отдельно)"""
+            item_type = ITEM_TYPES[values[0]]
+            item = item_type.__new__(item_type)
+            Item.__init__(item, values[1], values[2], values[3], values[4])
+            for name, value in zip(item_type._snapshot_fields, values[10:]):
+                setattr(item, name, value)
+            item._status = ItemStatus(values[5])
+            if values[7] is not None:
+                item._borrowed_date = datetime.fromtimestamp(values[7])
+            if values[8] is not None:
+                item._due_date = datetime.fromtimestamp(values[8])
+            return item
     
     class Book(Item):
         """Книга"""
         
+        __slots__ = ('author', 'isbn', 'pages')
+        _snapshot_fields = ('author', 'isbn', 'pages')
+        
         def __init__(self, item_id: str, title: str, author: str, publisher: str, 
                      year: int, isbn: str, pages: int):
             super().__init__(item_id, title, publisher, year)
@@ -176,12 +368,18 @@ def exercise_01_library_management_system():
         def get_category(self):
             return "Книга"
         
+        def get_search_fields(self):
+            return (self._title, self.author)
+        
         def __str__(self):
             return f"Книга: {self.title} - {self.author} ({self.year})"
     
     class Magazine(Item):
         """Журнал"""
         
+        __slots__ = ('issue_number', 'month')
+        _snapshot_fields = ('issue_number', 'month')
+        
         def __init__(self, item_id: str, title: str, publisher: str, 
                      year: int, issue_number: int, month: str):
             super().__init__(item_id, title, publisher, year)
@@ -200,6 +398,9 @@ def exercise_01_library_management_system():
     class DVD(Item):
         """DVD диск"""
         
+        __slots__ = ('director', 'duration', 'genre')
+        _snapshot_fields = ('director', 'duration', 'genre')
+        
         def __init__(self, item_id: str, title: str, director: str, publisher: str,
                      year: int, duration: int, genre: str):
             super().__init__(item_id, title, publisher, year)
@@ -213,18 +414,26 @@ def exercise_01_library_management_system():
         def get_category(self):
             return "DVD"
         
+        def get_search_fields(self):
+            return (self._title, self.director)
+        
         def __str__(self):
             return f"DVD: {self.title} - {self.director} ({self.year}, {self.genre})"
     
+    ITEM_TYPES = {item_type.__name__: item_type for item_type in (Book, Magazine, DVD)}
+    
     class Member:
         """Читатель библиотеки"""
         
+        __slots__ = ('member_id', '_name', '_email', '_phone', '_borrowed_items',
+                     '_registration_date', '_fine_amount')
+        
         def __init__(self, member_id: str, name: str, email: str, phone: str):
             self.member_id = member_id
             self._name = name
             self._email = email
             self._phone = phone
-            self._borrowed_items = []
+            self._borrowed_items = {}  # item_id -> Item в порядке выдачи
             self._registration_date = datetime.now()
             self._fine_amount = 0.0
         
@@ -250,7 +459,16 @@ def exercise_01_library_management_system():
         
         @property
         def borrowed_items(self):
-            return self._borrowed_items.copy()
+            """Живое представление взятых элементов только для чтения"""
+            return self._borrowed_items.values()
+        
+        @property
+        def borrowed_count(self):
+            return len(self._borrowed_items)
+        
+        def has_borrowed(self, item):
+            """Проверить, что элемент взят этим читателем"""
+            return item.item_id in self._borrowed_items
         
         @property
         def fine_amount(self):
@@ -258,13 +476,11 @@ def exercise_01_library_management_system():
         
         def add_borrowed_item(self, item):
             """Добавить взятый элемент"""
-            if item not in self._borrowed_items:
-                self._borrowed_items.append(item)
+            self._borrowed_items.setdefault(item.item_id, item)
         
         def remove_borrowed_item(self, item):
             """Удалить возвращенный элемент"""
-            if item in self._borrowed_items:
-                self._borrowed_items.remove(item)
+            self._borrowed_items.pop(item.item_id, None)
         
         def add_fine(self, amount):
             """Добавить штраф"""
@@ -294,34 +510,1852 @@ def exercise_01_library_management_system():
         
         def __hash__(self):
             return hash(self.member_id)
+        
+        def to_record(self):
+            """Кортеж простых значений для двоичного снимка"""
+            return (self.member_id, self._name, self._email, self._phone,
+                    self._registration_date.timestamp(), self._fine_amount,
+                    *self._borrowed_items)
+        
+        @staticmethod
+        def from_record(values):
+            """Создать читателя из записи снимка (элементы связываются отдельно)"""
+            member = Member(values[0], values[1], values[2], values[3])
+            member._registration_date = datetime.fromtimestamp(values[4])
+            member._fine_amount = values[5]
+            return member
+    
+    class FineEngine:
+        """
+        Расчёт штрафов за просрочку.
+        
+        Ставка ступенчатая: tiers — пары (с какого дня просрочки, ставка
+        за день); сумма умножается на коэффициент категории. Для пакета
+        элементов дни просрочки передаются массивом, и штрафы считаются
+        одним выражением NumPy.
+        """
+        
+        EPOCH = datetime(1970, 1, 1)
+        MICROSECONDS_PER_DAY = 86_400_000_000
+        
+        def __init__(self, tiers=((1, 1.0),), category_rates=None):
+            tiers = sorted(tiers)
+            if not tiers or tiers[0][0] != 1:
+                raise ValueError("Первая ступень штрафа должна начинаться с 1 дня")
+            self._tiers = tiers
+            self._starts = np.array([start for start, _ in tiers], dtype=np.int64)
+            self._rates = np.array([rate for _, rate in tiers], dtype=np.float64)
+            # Длина ступени в днях; последняя ступень не ограничена
+            self._widths = np.append(np.diff(self._starts), np.iinfo(np.int64).max)
+            self._category_rates = dict(category_rates or {})
+        
+        @classmethod
+        def epoch_microseconds(cls, moment: datetime):
+            """Микросекунды от 1970-01-01 — целое, чтобы деление на сутки было точным"""
+            return (moment - cls.EPOCH) // timedelta(microseconds=1)
+        
+        @staticmethod
+        def overdue_days(due_date: datetime, today: datetime):
+            """Полные сутки (по 24 часа), прошедшие после срока возврата"""
+            return max((today - due_date).days, 0)
+        
+        @property
+        def tiers(self):
+            """Ступени (с какого дня, ставка за день) по возрастанию"""
+            return list(self._tiers)
+        
+        @property
+        def category_rates(self):
+            return dict(self._category_rates)
+        
+        def category_rate(self, category: str):
+            return self._category_rates.get(category, 1.0)
+        
+        def fine_for_days(self, days: int, category: str = None):
+            """Штраф за days дней просрочки для одного элемента"""
+            fine = 0.0
+            for (start, rate), width in zip(self._tiers, self._widths.tolist()):
+                fine += rate * min(max(days - start + 1, 0), width)
+            return fine * self.category_rate(category)
+        
+        def fines(self, overdue_days, multipliers):
+            """Векторный штраф: overdue_days и multipliers — массивы одной длины"""
+            days_in_tier = np.clip(overdue_days[:, None] - self._starts[None, :] + 1,
+                                   0, self._widths[None, :])
+            return (days_in_tier * self._rates).sum(axis=1) * multipliers
+    
+    class RadixNode:
+        """Узел сжатого префиксного дерева: метка ребра и posting-лист слова"""
+        
+        __slots__ = ('label', 'children', 'postings')
+        
+        def __init__(self, label=""):
+            self.label = label
+            self.children = {}  # первая буква метки -> RadixNode
+            self.postings = {}  # item_id -> None для слова, оканчивающегося здесь
+    
+    class AutocompleteTrie:
+        """
+        Сжатое префиксное дерево (radix tree) слов каталога.
+        
+        Дополнение по префиксу обходит поддерево от коротких слов к длинным;
+        поиск с опечатками идёт по дереву со строкой динамики Левенштейна
+        и отсекает ветви, где расстояние уже больше допустимого. Обход
+        прерывается по истечении бюджета времени.
+        """
+        
+        def __init__(self):
+            self._root = RadixNode()
+        
+        def add(self, term: str, item_id: str):
+            """Добавить item_id в posting-лист слова"""
+            node, rest = self._root, term
+            while rest:
+                child = node.children.get(rest[0])
+                if child is None:
+                    child = node.children[rest[0]] = RadixNode(rest)
+                    node, rest = child, ""
+                    break
+                common = 0
+                limit = min(len(child.label), len(rest))
+                while common < limit and child.label[common] == rest[common]:
+                    common += 1
+                if common < len(child.label):
+                    # Разбиваем ребро на общий префикс и остаток
+                    split = RadixNode(child.label[:common])
+                    child.label = child.label[common:]
+                    split.children[child.label[0]] = child
+                    node.children[rest[0]] = split
+                    child = split
+                node, rest = child, rest[common:]
+            node.postings[item_id] = None
+        
+        def remove(self, term: str, item_id: str):
+            """Удалить item_id из posting-листа слова и сжать освободившиеся узлы"""
+            path = [self._root]
+            rest = term
+            while rest:
+                child = path[-1].children.get(rest[0])
+                if child is None or not rest.startswith(child.label):
+                    return
+                path.append(child)
+                rest = rest[len(child.label):]
+            node = path[-1]
+            node.postings.pop(item_id, None)
+            
+            while len(path) > 1:
+                node = path.pop()
+                parent = path[-1]
+                if node.postings:
+                    break
+                if not node.children:
+                    del parent.children[node.label[0]]
+                    continue
+                if len(node.children) == 1:
+                    # Склеиваем узел с единственным потомком
+                    (child,) = node.children.values()
+                    child.label = node.label + child.label
+                    parent.children[child.label[0]] = child
+                break
+        
+        def _find_prefix(self, prefix: str):
+            """Узел, покрывающий префикс, и слово до конца его метки"""
+            node, path, rest = self._root, "", prefix
+            while rest:
+                child = node.children.get(rest[0])
+                if child is None:
+                    return None
+                if rest.startswith(child.label):
+                    rest = rest[len(child.label):]
+                elif child.label.startswith(rest):
+                    rest = ""
+                else:
+                    return None
+                node, path = child, path + child.label
+            return node, path
+        
+        @staticmethod
+        def _completions(node, term, deadline):
+            """Слова поддерева в порядке возрастания длины: (слово, posting-лист)"""
+            heap = [(len(term), term, node)]
+            while heap:
+                if deadline is not None and time.perf_counter() > deadline:
+                    return
+                _, term, node = heapq.heappop(heap)
+                if node.postings:
+                    yield term, node.postings
+                for child in node.children.values():
+                    child_term = term + child.label
+                    heapq.heappush(heap, (len(child_term), child_term, child))
+        
+        def _fuzzy_anchors(self, query: str, max_distance: int, deadline):
+            """Узлы, чей префикс отличается от query не более чем на max_distance правок"""
+            anchors = []
+            stack = [(child, "", list(range(len(query) + 1)))
+                     for child in self._root.children.values()]
+            while stack:
+                if deadline is not None and time.perf_counter() > deadline:
+                    break
+                node, prefix, row = stack.pop()
+                matched = None
+                for char in node.label:
+                    next_row = [row[0] + 1]
+                    for j, query_char in enumerate(query, 1):
+                        next_row.append(min(next_row[j - 1] + 1, row[j] + 1,
+                                            row[j - 1] + (query_char != char)))
+                    row = next_row
+                    if row[-1] <= max_distance and (matched is None or row[-1] < matched):
+                        matched = row[-1]
+                    if min(row) > max_distance:
+                        break
+                else:
+                    stack.extend((child, prefix + node.label, row)
+                                 for child in node.children.values())
+                if matched is not None:
+                    anchors.append((matched, prefix + node.label, node))
+            return anchors
+        
+        def complete(self, query: str, k: int = 10, max_distance: int = 1,
+                     deadline=None, allowed=None):
+            """
+            До k item_id, ранжированных по (число правок, длина дополнения).
+            
+            Сначала берутся точные дополнения префикса; поиск с опечатками
+            запускается, только если их не хватило. allowed ограничивает
+            допустимые item_id.
+            """
+            found = self._find_prefix(query)
+            anchors = [(0, found[1], found[0])] if found else []
+            ranked = self._collect(anchors, query, k, deadline, allowed)
+            if len(ranked) < k and max_distance > 0:
+                anchors = sorted(self._fuzzy_anchors(query, max_distance, deadline),
+                                 key=lambda anchor: (anchor[0], len(anchor[1])))
+                for item_id in self._collect(anchors, query, k, deadline, allowed):
+                    ranked.setdefault(item_id, None)
+                    if len(ranked) >= k:
+                        break
+            return list(ranked)
+        
+        def _collect(self, anchors, query, k, deadline, allowed):
+            scored = {}  # item_id -> лучшая оценка
+            for distance, term, node in anchors:
+                for completion, postings in self._completions(node, term, deadline):
+                    score = (distance, len(completion) - len(query))
+                    for item_id in postings:
+                        if allowed is not None and item_id not in allowed:
+                            continue
+                        if item_id not in scored or score < scored[item_id]:
+                            scored[item_id] = score
+                        # Дополнения идут по возрастанию оценки — дальше только хуже
+                        if len(scored) >= k:
+                            break
+                    if len(scored) >= k:
+                        break
+                if len(scored) >= k:
+                    break
+            ranked = sorted(scored, key=scored.__getitem__)[:k]
+            return dict.fromkeys(ranked)
+    
+    class HoldQueue:
+        """
+        FIFO-очередь резервов одного элемента.
+        
+        Каждый резерв получает возрастающий номер билета. Отмена ленивая:
+        билет попадает в множество отменённых, а запись остаётся в deque
+        и пропускается, когда доходит до головы. push, cancel и pop
+        выполняются за O(1) (амортизированно). Позиция читателя — разность
+        его билета и билета головы за вычетом отменённых билетов перед
+        ним; их подсчёт — O(число отменённых в очереди). Когда отменённых
+        становится больше активных, очередь сжимается и билеты
+        перенумеровываются, так что position не дороже O(длины очереди).
+        """
+        
+        def __init__(self):
+            self._queue = deque()  # (билет, member_id)
+            self._tickets = {}  # member_id -> билет активного резерва
+            self._cancelled = set()  # билеты отменённых резервов, ещё лежащих в deque
+            self._next_ticket = 0
+        
+        def push(self, member_id):
+            """Встать в очередь; возвращает позицию (с 1)"""
+            if member_id in self._tickets:
+                raise ValueError(f"Читатель {member_id} уже в очереди")
+            ticket = self._next_ticket
+            self._next_ticket += 1
+            self._tickets[member_id] = ticket
+            self._queue.append((ticket, member_id))
+            return len(self._tickets)
+        
+        def cancel(self, member_id):
+            """Отменить резерв; возвращает True, если он был"""
+            ticket = self._tickets.pop(member_id, None)
+            if ticket is None:
+                return False
+            self._cancelled.add(ticket)
+            if len(self._cancelled) > len(self._tickets):
+                self._compact()
+            return True
+        
+        def _compact(self):
+            """Убрать отменённые записи и перенумеровать билеты подряд"""
+            self._queue = deque(
+                (ticket, member_id) for ticket, (_, member_id) in enumerate(
+                    entry for entry in self._queue if entry[0] not in self._cancelled))
+            self._tickets = {member_id: ticket for ticket, member_id in self._queue}
+            self._cancelled.clear()
+            self._next_ticket = len(self._queue)
+        
+        def pop(self):
+            """Следующий читатель в очереди или None"""
+            while self._queue:
+                ticket, member_id = self._queue.popleft()
+                if ticket in self._cancelled:
+                    self._cancelled.discard(ticket)
+                    continue
+                del self._tickets[member_id]
+                return member_id
+            return None
+        
+        def position(self, member_id):
+            """Позиция читателя (1 — следующий) или None"""
+            ticket = self._tickets.get(member_id)
+            if ticket is None:
+                return None
+            head_ticket = self._queue[0][0]
+            cancelled_ahead = sum(1 for cancelled in self._cancelled if cancelled < ticket)
+            return ticket - head_ticket - cancelled_ahead + 1
+        
+        def __contains__(self, member_id):
+            return member_id in self._tickets
+        
+        def __len__(self):
+            return len(self._tickets)
+    
+    class InvertedIndex:
+        """
+        Инвертированный индекс: токен -> упорядоченное множество item_id.
+        
+        Рядом с posting-листами хранится отсортированный список токенов:
+        слово запроса ищется как префикс двоичным поиском по нему, и
+        "пит" находит элементы со словом "питон".
+        """
+        
+        _TOKEN_RE = re.compile(r"\w+")
+        _EMPTY = {}
+        _PREFIX_END = "\U0010ffff"  # Больше любого символа токена
+        
+        def __init__(self):
+            # dict вместо set сохраняет порядок добавления элементов
+            self._postings = {}  # token -> {item_id: номер элемента по порядку добавления}
+            self._order = {}  # item_id -> номер по порядку добавления
+            self._tokens = None  # Отсортированные токены, строятся при первом поиске
+        
+        @classmethod
+        def tokenize(cls, text):
+            """Разбить текст на токены в нижнем регистре"""
+            return cls._TOKEN_RE.findall(text.lower()) if text else []
+        
+        def add(self, item_id, tokens):
+            """Добавить item_id в posting-листы токенов"""
+            seq = self._order.setdefault(item_id, len(self._order))
+            for token in tokens:
+                posting = self._postings.get(token)
+                if posting is None:
+                    posting = self._postings[token] = {}
+                    if self._tokens is not None:
+                        bisect.insort(self._tokens, token)
+                posting[item_id] = seq
+        
+        def remove(self, item_id, tokens):
+            """Удалить item_id из posting-листов токенов"""
+            for token in tokens:
+                posting = self._postings.get(token)
+                if posting is not None:
+                    posting.pop(item_id, None)
+                    if not posting:
+                        del self._postings[token]
+                        if self._tokens is not None:
+                            del self._tokens[bisect.bisect_left(self._tokens, token)]
+        
+        def get(self, token):
+            """Posting-лист токена (только для чтения)"""
+            return self._postings.get(token, self._EMPTY)
+        
+        @classmethod
+        def prefix_range(cls, sorted_tokens, prefix):
+            """Границы [start, end) токенов с префиксом prefix в отсортированном списке"""
+            start = bisect.bisect_left(sorted_tokens, prefix)
+            return start, bisect.bisect_left(sorted_tokens, prefix + cls._PREFIX_END, start)
+        
+        def get_prefix(self, prefix):
+            """Объединённый posting-лист токенов, начинающихся с prefix (только для чтения)"""
+            if self._tokens is None:
+                self._tokens = sorted(self._postings)
+            start, end = self.prefix_range(self._tokens, prefix)
+            if end - start == 1:
+                return self._postings[self._tokens[start]]
+            merged = {}
+            for token in self._tokens[start:end]:
+                merged.update(self._postings[token])
+            # Слияние нескольких листов возвращается в порядке добавления элементов
+            return dict(sorted(merged.items(), key=lambda pair: pair[1]))
+        
+        @staticmethod
+        def matches(query_tokens, tokens):
+            """Каждое слово запроса — начало какого-нибудь из tokens"""
+            return all(any(token.startswith(query_token) for token in tokens)
+                       for query_token in query_tokens)
+        
+        @staticmethod
+        def intersect(postings):
+            """Пересечение posting-листов, начиная с самого короткого"""
+            if not postings:
+                return []
+            postings = sorted(postings, key=len)
+            smallest, rest = postings[0], postings[1:]
+            return [item_id for item_id in smallest
+                    if all(item_id in posting for posting in rest)]
+        
+        def __len__(self):
+            return len(self._postings)
+    
+    class DueDateQueue:
+        """
+        Выданные элементы, упорядоченные по сроку возврата.
+        
+        Ещё не просроченные элементы лежат в куче; при запросе из неё
+        извлекается только префикс с истёкшим сроком и переносится
+        в упорядоченный словарь просроченных.
+        """
+        
+        def __init__(self):
+            self._heap = []  # [due_date, seq, item_id]
+            self._entries = {}  # item_id -> запись кучи
+            self._expired = {}  # item_id -> due_date в порядке истечения срока
+            self._stale = 0  # Лениво удалённые записи в куче
+            self._counter = itertools.count()
+        
+        def push(self, item_id, due_date):
+            """Поставить выданный элемент в очередь"""
+            self.discard(item_id)
+            entry = [due_date, next(self._counter), item_id]
+            self._entries[item_id] = entry
+            heapq.heappush(self._heap, entry)
+        
+        def discard(self, item_id):
+            """Убрать возвращённый элемент из очереди"""
+            if self._expired.pop(item_id, None) is not None:
+                return
+            entry = self._entries.pop(item_id, None)
+            if entry is None:
+                return
+            # Ленивое удаление: запись будет пропущена при извлечении
+            entry[2] = None
+            self._stale += 1
+            if self._stale > 64 and self._stale * 2 > len(self._heap):
+                self._heap = [e for e in self._heap if e[2] is not None]
+                heapq.heapify(self._heap)
+                self._stale = 0
+        
+        def pop_expired(self, now):
+            """Перенести истёкшие записи и вернуть словарь просроченных"""
+            heap = self._heap
+            while heap and heap[0][0] < now:
+                due_date, _, item_id = heapq.heappop(heap)
+                if item_id is None:
+                    self._stale -= 1
+                    continue
+                del self._entries[item_id]
+                self._expired[item_id] = due_date
+            return self._expired
+        
+        def items(self):
+            """Пары (item_id, due_date) всех выданных элементов"""
+            yield from self._expired.items()
+            for due_date, _, item_id in self._entries.values():
+                yield item_id, due_date
+        
+        def __len__(self):
+            return len(self._entries) + len(self._expired)
+    
+    class RecordCodec:
+        """
+        Двоичные записи из кортежей простых значений.
+        
+        Запись — длина (u32) и значения с однобайтовым тегом типа:
+        None, int (i64), float (f64) или str (u32 длина + UTF-8).
+        """
+        
+        U32 = struct.Struct("<I")
+        _I64 = struct.Struct("<q")
+        _F64 = struct.Struct("<d")
+        _NONE, _INT, _FLOAT, _STR = b"n", b"i", b"f", b"s"
+        
+        @classmethod
+        def encode(cls, values):
+            """Закодировать кортеж значений в запись с префиксом длины"""
+            parts = []
+            for value in values:
+                if value is None:
+                    parts.append(cls._NONE)
+                elif isinstance(value, int):
+                    parts.append(cls._INT + cls._I64.pack(value))
+                elif isinstance(value, float):
+                    parts.append(cls._FLOAT + cls._F64.pack(value))
+                elif isinstance(value, str):
+                    data = value.encode("utf-8")
+                    parts.append(cls._STR + cls.U32.pack(len(data)) + data)
+                else:
+                    raise TypeError(f"Неподдерживаемый тип в записи: {type(value).__name__}")
+            payload = b"".join(parts)
+            return cls.U32.pack(len(payload)) + payload
+        
+        @classmethod
+        def decode(cls, buffer, offset=0):
+            """Прочитать запись, начинающуюся со смещения offset"""
+            (length,) = cls.U32.unpack_from(buffer, offset)
+            position = offset + cls.U32.size
+            end = position + length
+            values = []
+            while position < end:
+                tag = buffer[position:position + 1]
+                position += 1
+                if tag == cls._NONE:
+                    values.append(None)
+                elif tag == cls._INT:
+                    values.append(cls._I64.unpack_from(buffer, position)[0])
+                    position += cls._I64.size
+                elif tag == cls._FLOAT:
+                    values.append(cls._F64.unpack_from(buffer, position)[0])
+                    position += cls._F64.size
+                elif tag == cls._STR:
+                    (size,) = cls.U32.unpack_from(buffer, position)
+                    position += cls.U32.size
+                    values.append(bytes(buffer[position:position + size]).decode("utf-8"))
+                    position += size
+                else:
+                    raise ValueError(f"Повреждённая запись: неизвестный тег {tag!r}")
+            return tuple(values)
+    
+    class SnapshotTable:
+        """Таблица смещений снимка: отсортированные по ID пары (ключ, запись)"""
+        
+        ENTRY = struct.Struct("<QQ")  # смещение ключа, смещение записи
+        
+        def __init__(self, buffer, offset, count):
+            self._buffer = buffer
+            self._offset = offset
+            self._count = count
+        
+        def _entry(self, index):
+            return self.ENTRY.unpack_from(self._buffer, self._offset + index * self.ENTRY.size)
+        
+        def _key(self, key_offset):
+            (size,) = RecordCodec.U32.unpack_from(self._buffer, key_offset)
+            start = key_offset + RecordCodec.U32.size
+            return bytes(self._buffer[start:start + size])
+        
+        def find(self, key):
+            """Смещение записи по ID (бинарный поиск) или None"""
+            target = key.encode("utf-8")
+            low, high = 0, self._count
+            while low < high:
+                middle = (low + high) // 2
+                key_offset, record_offset = self._entry(middle)
+                current = self._key(key_offset)
+                if current == target:
+                    return record_offset
+                if current < target:
+                    low = middle + 1
+                else:
+                    high = middle
+            return None
+        
+        def read(self, record_offset):
+            return RecordCodec.decode(self._buffer, record_offset)
+        
+        def keys(self):
+            for index in range(self._count):
+                yield self._key(self._entry(index)[0]).decode("utf-8")
+        
+        def __len__(self):
+            return self._count
+    
+    class SnapshotFile:
+        """
+        Двоичный снимок библиотеки.
+        
+        Формат: заголовок, записи элементов и читателей с префиксом длины,
+        отсортированные по ID таблицы смещений и запись метаданных.
+        Файл открывается через mmap, поэтому открытие не зависит от
+        размера каталога, а записи декодируются только при обращении.
+        """
+        
+        MAGIC = b"LIBSNAP2"
+        HEADER = struct.Struct("<8sQQQQQ")  # magic, элементы, таблица, читатели, таблица, метаданные
+        
+        def __init__(self, path):
+            with open(path, 'rb') as snapshot_file:
+                self._buffer = mmap.mmap(snapshot_file.fileno(), 0, access=mmap.ACCESS_READ)
+            (magic, items_count, items_table, members_count, members_table,
+             meta_offset) = self.HEADER.unpack_from(self._buffer, 0)
+            if magic != self.MAGIC:
+                self._buffer.close()
+                raise ValueError(f"Файл {path} не является снимком библиотеки")
+            self.items = SnapshotTable(self._buffer, items_table, items_count)
+            self.members = SnapshotTable(self._buffer, members_table, members_count)
+            self.meta = RecordCodec.decode(self._buffer, meta_offset)
+        
+        @classmethod
+        def write(cls, path, items, members, meta):
+            """Записать снимок; items и members — итерируемые пары (ID, запись)"""
+            with open(path, 'wb') as snapshot_file:
+                snapshot_file.write(bytes(cls.HEADER.size))
+                items_entries = cls._write_records(snapshot_file, items)
+                members_entries = cls._write_records(snapshot_file, members)
+                items_table = cls._write_table(snapshot_file, items_entries)
+                members_table = cls._write_table(snapshot_file, members_entries)
+                meta_offset = snapshot_file.tell()
+                snapshot_file.write(RecordCodec.encode(meta))
+                snapshot_file.seek(0)
+                snapshot_file.write(cls.HEADER.pack(cls.MAGIC, len(items_entries), items_table,
+                                                    len(members_entries), members_table,
+                                                    meta_offset))
+        
+        @staticmethod
+        def _write_records(snapshot_file, records):
+            entries = []
+            for key, values in records:
+                data = key.encode("utf-8")
+                key_offset = snapshot_file.tell()
+                snapshot_file.write(RecordCodec.U32.pack(len(data)) + data)
+                entries.append((data, key_offset, snapshot_file.tell()))
+                snapshot_file.write(RecordCodec.encode(values))
+            return entries
+        
+        @staticmethod
+        def _write_table(snapshot_file, entries):
+            table_offset = snapshot_file.tell()
+            entries.sort()
+            for _, key_offset, record_offset in entries:
+                snapshot_file.write(SnapshotTable.ENTRY.pack(key_offset, record_offset))
+            return table_offset
+        
+        def close(self):
+            self._buffer.close()
+    
+    class RecordStore(Mapping):
+        """
+        Хранилище объектов библиотеки: отображение ID -> объект.
+        
+        Библиотека добавляет объекты через store[id] = obj и сообщает об
+        изменении элемента через save(item), а о смене полей поиска — через
+        reindex(item). Хранилище, переживающее закрытие, сохраняет и
+        читателей (save_member) и отдаёт их при открытии (members), чтобы
+        выданные элементы снова были связаны с ними. Запросы status_counts,
+        due_before, loans и search по умолчанию сканируют все элементы;
+        хранилища с индексами отвечают на них без загрузки объектов.
+        Хранилище с supports_search = True само ищет по словам, и
+        библиотека не держит для него индекс в памяти.
+        """
+        
+        __slots__ = ()
+        supports_search = False
+        
+        @abstractmethod
+        def __setitem__(self, key, value):
+            """Добавить объект"""
+        
+        def attach(self, library):
+            """Связать хранилище с библиотекой (для восстановленных элементов)"""
+        
+        def save(self, item):
+            """Элемент изменился и должен быть записан"""
+        
+        def reindex(self, item):
+            """У элемента изменились поля поиска"""
+            self.save(item)
+        
+        def save_member(self, member):
+            """Читатель изменился и должен быть записан"""
+        
+        def members(self):
+            """Читатели, сохранённые вместе с элементами"""
+            return ()
+        
+        def flush(self):
+            """Записать накопленные изменения"""
+        
+        def close(self):
+            """Записать изменения и освободить ресурсы"""
+            self.flush()
+        
+        def status_counts(self):
+            """Количество элементов по парам (категория, статус)"""
+            return Counter((item.get_category(), item.status.value) for item in self.values())
+        
+        def due_before(self, ts: float):
+            """ID выданных элементов со сроком возврата раньше ts"""
+            return [item.item_id for item in self.values()
+                    if item.status == ItemStatus.BORROWED and item._due_date.timestamp() < ts]
+        
+        def loans(self):
+            """Пары (ID, срок возврата как timestamp) всех выданных элементов"""
+            return [(item.item_id, item._due_date.timestamp()) for item in self.values()
+                    if item.status == ItemStatus.BORROWED]
+        
+        def search(self, tokens, category: str = None):
+            """ID элементов, у которых каждое слово tokens — начало слова (и категория)"""
+            return [item.item_id for item in self.values()
+                    if (not category or item.get_category() == category)
+                    and InvertedIndex.matches(tokens, Library._item_tokens(item.get_search_fields()))]
+    
+    class InMemoryStore(dict, RecordStore):
+        """Хранилище в словаре — прежнее поведение Library, доступ со скоростью dict"""
+    
+    class SQLiteItemStore(RecordStore):
+        """
+        Элементы в таблице SQLite для каталогов больше памяти.
+        
+        Запись элемента — RecordCodec от to_record() плюс индексируемые
+        колонки title, status и due_date. Изменения копятся и пишутся
+        пачками через executemany; восстановленные объекты держатся в
+        LRU-кэше на cache_size элементов. Выданные и отложенные элементы
+        из памяти не вытесняются: на них ссылаются читатели, и объект
+        должен оставаться одним и тем же.
+        
+        Слова полей поиска лежат в таблице item_terms, и search_items
+        библиотеки выполняется запросом к ней. Подсказки autocomplete по-
+        прежнему строят префиксное дерево в памяти при первом вызове.
+        Читатели лежат в таблице members: библиотека отмечает читателя
+        после каждой его операции, а close записывает всех, включая
+        изменения в обход библиотеки (Member.pay_fine). Запись элемента
+        хранит ID того, кому он выдан или отложен, поэтому после
+        повторного открытия элемент снова связан с читателем.
+        """
+        
+        _SCHEMA = (
+            "CREATE TABLE IF NOT EXISTS items (item_id TEXT PRIMARY KEY, category TEXT, "
+            "title TEXT, status TEXT, due_date REAL, record BLOB)",
+            "CREATE INDEX IF NOT EXISTS items_title ON items (title)",
+            "CREATE INDEX IF NOT EXISTS items_status ON items (status, category)",
+            "CREATE INDEX IF NOT EXISTS items_due_date ON items (due_date) WHERE due_date IS NOT NULL",
+            "CREATE TABLE IF NOT EXISTS item_terms (token TEXT, item_id TEXT, "
+            "PRIMARY KEY (token, item_id)) WITHOUT ROWID",
+            "CREATE INDEX IF NOT EXISTS item_terms_item ON item_terms (item_id)",
+            "CREATE TABLE IF NOT EXISTS members (member_id TEXT PRIMARY KEY, record BLOB)",
+        )
+        supports_search = True
+        # Постоянный текст запросов: sqlite3 кэширует подготовленные выражения
+        _UPSERT = ("INSERT INTO items VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (item_id) DO UPDATE SET "
+                   "category = excluded.category, title = excluded.title, status = excluded.status, "
+                   "due_date = excluded.due_date, record = excluded.record")
+        _SELECT = "SELECT record FROM items WHERE item_id = ?"
+        _EXISTS = "SELECT 1 FROM items WHERE item_id = ?"
+        _KEYS = "SELECT item_id FROM items ORDER BY rowid"
+        _STATUS_COUNTS = "SELECT category, status, COUNT(*) FROM items GROUP BY status, category"
+        _DUE_BEFORE = "SELECT item_id FROM items WHERE due_date < ? AND status = ?"
+        _BY_TITLE = "SELECT item_id FROM items WHERE title = ?"
+        _LOANS = "SELECT item_id, due_date FROM items WHERE status = ?"
+        _DELETE_TERMS = "DELETE FROM item_terms WHERE item_id = ?"
+        _INSERT_TERM = "INSERT OR IGNORE INTO item_terms VALUES (?, ?)"
+        _TERM_QUERY = "SELECT item_id FROM item_terms WHERE token >= ? AND token < ?"
+        _CATEGORY_QUERY = "SELECT item_id FROM items WHERE category = ?"
+        _UPSERT_MEMBER = ("INSERT INTO members VALUES (?, ?) ON CONFLICT (member_id) "
+                          "DO UPDATE SET record = excluded.record")
+        _MEMBERS = "SELECT record FROM members ORDER BY rowid"
+        _PINNED_STATUSES = (ItemStatus.BORROWED, ItemStatus.RESERVED)
+        
+        def __init__(self, path: str = ":memory:", cache_size: int = 10_000,
+                     batch_size: int = 500):
+            self._connection = sqlite3.connect(path, check_same_thread=False)
+            for statement in self._SCHEMA:
+                self._connection.execute(statement)
+            self._cache_size = cache_size
+            self._batch_size = batch_size
+            self._cache = OrderedDict()  # item_id -> Item, от давних к недавним
+            self._pinned = {}  # item_id -> выданный или отложенный Item
+            self._pending = {}  # item_id -> Item, ещё не записанный в таблицу
+            self._reindex = set()  # item_id из _pending, чьи слова нужно переписать
+            self._pending_members = {}  # member_id -> Member, ещё не записанный в таблицу
+            self._library = None
+            self._lock = threading.RLock()
+            self._count = self._connection.execute("SELECT COUNT(*) FROM items").fetchone()[0]
+            self.hits = 0
+            self.misses = 0
+            if self._count and self._connection.execute(
+                    "SELECT 1 FROM item_terms LIMIT 1").fetchone() is None:
+                self._build_terms()
+        
+        @staticmethod
+        def _terms(item):
+            return ((token, item.item_id)
+                    for token in Library._item_tokens(item.get_search_fields()))
+        
+        def _build_terms(self):
+            """Заполнить item_terms для базы, созданной без таблицы слов"""
+            records = self._connection.execute("SELECT record FROM items")
+            with self._connection:
+                while True:
+                    rows = records.fetchmany(self._batch_size)
+                    if not rows:
+                        break
+                    self._connection.executemany(self._INSERT_TERM, itertools.chain.from_iterable(
+                        self._terms(Item.from_record(RecordCodec.decode(row[0]))) for row in rows))
+        
+        def attach(self, library):
+            self._library = library
+        
+        def _place(self, item):
+            """Закрепить активный элемент или поместить его в LRU-кэш"""
+            item_id = item.item_id
+            if item.status in self._PINNED_STATUSES:
+                self._pinned[item_id] = item
+                self._cache.pop(item_id, None)
+                return
+            self._pinned.pop(item_id, None)
+            self._cache[item_id] = item
+            self._cache.move_to_end(item_id)
+            while len(self._cache) > self._cache_size:
+                # Несохранённый элемент остаётся в _pending до записи пачки
+                self._cache.popitem(last=False)
+        
+        def _cached(self, key):
+            item = self._pinned.get(key)
+            if item is None:
+                item = self._cache.get(key)
+                if item is not None:
+                    self._cache.move_to_end(key)
+                else:
+                    item = self._pending.get(key)
+            return item
+        
+        def __getitem__(self, key):
+            with self._lock:
+                item = self._cached(key)
+                if item is not None:
+                    self.hits += 1
+                    return item
+                row = self._connection.execute(self._SELECT, (key,)).fetchone()
+                if row is None:
+                    raise KeyError(key)
+                self.misses += 1
+                values = RecordCodec.decode(row[0])
+                item = Item.from_record(values)
+                if self._library is not None:
+                    item._library = self._library
+                    self._library._link_item(item, values)
+                self._place(item)
+                return item
+        
+        def __contains__(self, key):
+            with self._lock:
+                if self._cached(key) is not None:
+                    return True
+                return self._connection.execute(self._EXISTS, (key,)).fetchone() is not None
+        
+        def __setitem__(self, key, item):
+            with self._lock:
+                if key not in self:
+                    self._count += 1
+                self.reindex(item)
+        
+        def reindex(self, item):
+            with self._lock:
+                self._reindex.add(item.item_id)
+                self.save(item)
+        
+        def save(self, item):
+            with self._lock:
+                self._pending[item.item_id] = item
+                self._place(item)
+                if len(self._pending) >= self._batch_size:
+                    self.flush()
+        
+        def save_member(self, member):
+            with self._lock:
+                self._pending_members[member.member_id] = member
+        
+        def members(self):
+            with self._lock:
+                self.flush()
+                rows = self._connection.execute(self._MEMBERS).fetchall()
+            return [Member.from_record(RecordCodec.decode(row[0])) for row in rows]
+        
+        def flush(self):
+            with self._lock:
+                if not self._pending and not self._pending_members:
+                    return
+                rows = []
+                for item_id, item in self._pending.items():
+                    record = item.to_record()
+                    rows.append((item_id, item.get_category(), record[2], record[5], record[8],
+                                 RecordCodec.encode(record)))
+                reindexed = [self._pending[item_id] for item_id in self._reindex]
+                with self._connection:
+                    self._connection.executemany(self._UPSERT, rows)
+                    self._connection.executemany(self._DELETE_TERMS,
+                                                 ((item.item_id,) for item in reindexed))
+                    self._connection.executemany(self._INSERT_TERM, itertools.chain.from_iterable(
+                        self._terms(item) for item in reindexed))
+                    self._connection.executemany(self._UPSERT_MEMBER, (
+                        (member_id, RecordCodec.encode(member.to_record()))
+                        for member_id, member in self._pending_members.items()))
+                self._pending.clear()
+                self._reindex.clear()
+                self._pending_members.clear()
+        
+        def close(self):
+            with self._lock:
+                if self._library is not None:
+                    for member in self._library._members.values():
+                        self.save_member(member)
+                self.flush()
+                self._connection.close()
+        
+        def __iter__(self):
+            # Ключи читаются сразу: курсор не должен пересекаться с записью пачек
+            with self._lock:
+                self.flush()
+                keys = [row[0] for row in self._connection.execute(self._KEYS)]
+            yield from keys
+        
+        def __len__(self):
+            return self._count
+        
+        def status_counts(self):
+            """Подсчёт по индексу статусов без загрузки элементов"""
+            with self._lock:
+                self.flush()
+                return Counter({(category, status): count for category, status, count
+                                in self._connection.execute(self._STATUS_COUNTS)})
+        
+        def due_before(self, ts: float):
+            """Просроченные по индексу сроков возврата"""
+            with self._lock:
+                self.flush()
+                return [row[0] for row in self._connection.execute(
+                    self._DUE_BEFORE, (ts, ItemStatus.BORROWED.value))]
+        
+        def find_title(self, title: str):
+            """ID элементов с точно таким названием (по индексу title)"""
+            with self._lock:
+                self.flush()
+                return [row[0] for row in self._connection.execute(self._BY_TITLE, (title,))]
+        
+        def loans(self):
+            """Выданные элементы и сроки по индексу статусов"""
+            with self._lock:
+                self.flush()
+                return self._connection.execute(
+                    self._LOANS, (ItemStatus.BORROWED.value,)).fetchall()
+        
+        def search(self, tokens, category: str = None):
+            """Пересечение префиксов слов и категории запросом к item_terms, в порядке добавления"""
+            queries = [self._TERM_QUERY] * len(tokens)
+            params = []
+            for token in tokens:
+                params += (token, token + InvertedIndex._PREFIX_END)
+            if category:
+                queries.append(self._CATEGORY_QUERY)
+                params.append(category)
+            sql = (f"SELECT item_id FROM items WHERE item_id IN ({' INTERSECT '.join(queries)}) "
+                   f"ORDER BY rowid")
+            with self._lock:
+                self.flush()
+                return [row[0] for row in self._connection.execute(sql, params)]
+    
+    class LazyRecordMap(RecordStore):
+        """
+        Словарь ID -> объект поверх таблицы снимка.
+        
+        Запись декодируется при первом обращении и кэшируется; объекты,
+        добавленные после загрузки, хранятся поверх снимка. Связи между
+        объектами восстанавливает link уже после помещения объекта в кэш,
+        поэтому взаимные ссылки элемента и читателя не зацикливаются.
+        Общая для элементов и читателей блокировка lock (RLock) нужна
+        потокобезопасной библиотеке: запись декодируется одним потоком,
+        и объект остаётся единственным.
+        """
+        
+        def __init__(self, table, build, link=None, lock=None):
+            self._table = table
+            self._build = build
+            self._link = link
+            self._lock = lock if lock is not None else nullcontext()
+            self._loaded = {}  # ID -> декодированный или добавленный объект
+            self._added = {}  # ID, которых нет в снимке, в порядке добавления
+        
+        @property
+        def loaded_count(self):
+            return len(self._loaded)
+        
+        def __getitem__(self, key):
+            obj = self._loaded.get(key)
+            if obj is not None:
+                return obj
+            with self._lock:
+                obj = self._loaded.get(key)
+                if obj is not None:
+                    return obj
+                record_offset = self._table.find(key)
+                if record_offset is None:
+                    raise KeyError(key)
+                values = self._table.read(record_offset)
+                obj = self._loaded[key] = self._build(values)
+                if self._link is not None:
+                    self._link(obj, values)
+                return obj
+        
+        def __setitem__(self, key, value):
+            with self._lock:
+                if key not in self:
+                    self._added[key] = None
+                self._loaded[key] = value
+        
+        def __contains__(self, key):
+            return key in self._loaded or self._table.find(key) is not None
+        
+        def __iter__(self):
+            yield from self._table.keys()
+            yield from self._added
+        
+        def __len__(self):
+            return len(self._table) + len(self._added)
+    
+    TransactionRecord = namedtuple(
+        'TransactionRecord', ['timestamp', 'type', 'item_id', 'member_id', 'amount', 'count'])
+    
+    # События изменения состояния библиотеки; seq растёт в порядке изменений
+    ItemAdded = namedtuple('ItemAdded', ['seq', 'timestamp', 'item_id', 'category', 'status'])
+    ItemBorrowed = namedtuple('ItemBorrowed', ['seq', 'timestamp', 'item_id', 'member_id', 'due_date'])
+    ItemReturned = namedtuple('ItemReturned', ['seq', 'timestamp', 'item_id', 'member_id', 'status'])
+    MemberFined = namedtuple('MemberFined', ['seq', 'timestamp', 'member_id', 'item_id', 'amount'])
+    MemberAdded = namedtuple('MemberAdded', ['seq', 'timestamp', 'member_id'])
+    
+    class EventSubscription:
+        """
+        Очередь событий одного подписчика — кольцо на capacity событий.
+        
+        При переполнении политика drop_oldest вытесняет самое старое
+        событие, drop_newest отбрасывает новое, block заставляет
+        публикующий поток ждать, пока подписчик освободит место (не
+        дольше block_timeout, затем событие отбрасывается). Отброшенные
+        события считаются в dropped.
+        """
+        
+        POLICIES = ('drop_oldest', 'drop_newest', 'block')
+        
+        def __init__(self, bus, capacity: int, policy: str, event_types, block_timeout):
+            if capacity < 1:
+                raise ValueError("Ёмкость очереди должна быть положительной")
+            if policy not in self.POLICIES:
+                raise ValueError(f"Неизвестная политика: {policy}")
+            self._bus = bus
+            self.capacity = capacity
+            self.policy = policy
+            self.event_types = frozenset(event_types) if event_types is not None else None
+            self.block_timeout = block_timeout
+            self.dropped = 0
+            self.closed = False
+            self._buffer = deque(maxlen=capacity)
+            self._condition = threading.Condition()
+        
+        def _offer(self, event):
+            """Положить событие в кольцо по политике подписчика"""
+            with self._condition:
+                if self.closed:
+                    return
+                if len(self._buffer) >= self.capacity:
+                    if self.policy == 'drop_newest':
+                        self.dropped += 1
+                        return
+                    if self.policy == 'block':
+                        has_room = self._condition.wait_for(
+                            lambda: len(self._buffer) < self.capacity or self.closed,
+                            self.block_timeout)
+                        if self.closed:
+                            return
+                        if not has_room:
+                            self.dropped += 1
+                            return
+                    else:
+                        self.dropped += 1  # deque с maxlen вытеснит самое старое
+                self._buffer.append(event)
+                self._condition.notify_all()
+        
+        def poll(self, max_events: int = None):
+            """Забрать накопленные события без ожидания"""
+            with self._condition:
+                count = len(self._buffer) if max_events is None else min(max_events, len(self._buffer))
+                events = [self._buffer.popleft() for _ in range(count)]
+                if events:
+                    self._condition.notify_all()
+                return events
+        
+        def get(self, timeout: float = None):
+            """Дождаться следующего события; None по таймауту или после close()"""
+            with self._condition:
+                if not self._condition.wait_for(lambda: self._buffer or self.closed, timeout):
+                    return None
+                if not self._buffer:
+                    return None
+                event = self._buffer.popleft()
+                self._condition.notify_all()
+                return event
+        
+        def close(self):
+            """Отписаться; ждущие публикующие потоки и читатели освобождаются"""
+            self._bus._unsubscribe(self)
+            with self._condition:
+                self.closed = True
+                self._condition.notify_all()
+        
+        def __len__(self):
+            return len(self._buffer)
+    
+    class EventBus:
+        """
+        Шина событий внутри процесса.
+        
+        Каждое событие раздаётся в кольца подписчиков, которым нужен его
+        тип. Если на тип никто не подписан, библиотека событие даже не
+        создаёт (wants). Список подписок заменяется целиком, поэтому
+        публикация идёт без общей блокировки.
+        """
+        
+        def __init__(self):
+            self._subscriptions = ()
+            self._wants_all = False
+            self._wanted_types = frozenset()
+            self._sequence = itertools.count(1)
+            self._lock = threading.Lock()
+        
+        def subscribe(self, capacity: int = 1024, policy: str = 'drop_oldest',
+                      event_types=None, block_timeout: float = None):
+            subscription = EventSubscription(self, capacity, policy, event_types, block_timeout)
+            with self._lock:
+                self._subscriptions += (subscription,)
+                self._refresh()
+            return subscription
+        
+        def _unsubscribe(self, subscription):
+            with self._lock:
+                self._subscriptions = tuple(other for other in self._subscriptions
+                                            if other is not subscription)
+                self._refresh()
+        
+        def _refresh(self):
+            self._wants_all = any(sub.event_types is None for sub in self._subscriptions)
+            self._wanted_types = frozenset().union(
+                *(sub.event_types for sub in self._subscriptions if sub.event_types is not None))
+        
+        def wants(self, event_type):
+            """Есть ли подписчики на события этого типа"""
+            return self._wants_all or event_type in self._wanted_types
+        
+        def next_sequence(self):
+            return next(self._sequence)
+        
+        def publish(self, events):
+            """Раздать события подписчикам"""
+            subscriptions = self._subscriptions
+            for event in events:
+                event_type = type(event)
+                for subscription in subscriptions:
+                    if subscription.event_types is None or event_type in subscription.event_types:
+                        subscription._offer(event)
+    
+    class PersistentMap(Mapping):
+        """
+        Неизменяемое отображение с общей структурой (hash array mapped trie).
+        
+        Узел — 32 ячейки, ячейка выбирается по очередным 5 битам хеша
+        ключа. Изменение копирует только узлы на пути к ключу, остальное
+        дерево разделяется со старыми версиями. Узлы, созданные с тем же
+        токеном владения owner, меняются на месте: пока версию никто не
+        видел, повторные записи не копируют путь заново.
+        """
+        
+        BITS = 5
+        WIDTH = 1 << BITS
+        MASK = WIDTH - 1
+        HASH_MASK = (1 << 64) - 1
+        
+        class Node:
+            __slots__ = ('owner', 'slots')
+            
+            def __init__(self, owner, slots):
+                self.owner = owner  # Токен владельца, которому разрешено менять узел
+                self.slots = slots  # None | (hash, key, value) | Node | dict при коллизии хешей
+        
+        __slots__ = ('_root', '_size')
+        
+        def __init__(self, root=None, size=0):
+            self._root = root if root is not None else self.Node(None, [None] * self.WIDTH)
+            self._size = size
+        
+        @classmethod
+        def _hash(cls, key):
+            return hash(key) & cls.HASH_MASK
+        
+        def _editable(self, node, owner):
+            """Узел, который можно менять: свой — как есть, чужой — копия"""
+            if owner is not None and node.owner is owner:
+                return node
+            return self.Node(owner, list(node.slots))
+        
+        def set(self, key, value, owner=None):
+            """Новая версия отображения с key -> value"""
+            root, added = self._assoc(self._root, 0, self._hash(key), key, value, owner)
+            return PersistentMap(root, self._size + added)
+        
+        def _assoc(self, node, shift, key_hash, key, value, owner):
+            node = self._editable(node, owner)
+            index = (key_hash >> shift) & self.MASK
+            slot = node.slots[index]
+            added = True
+            if slot is None:
+                node.slots[index] = (key_hash, key, value)
+            elif type(slot) is tuple and slot[1] == key:
+                node.slots[index] = (key_hash, key, value)
+                added = False
+            elif type(slot) is self.Node:
+                node.slots[index], added = self._assoc(
+                    slot, shift + self.BITS, key_hash, key, value, owner)
+            else:
+                slot_hash = slot[0] if type(slot) is tuple else self._hash(next(iter(slot)))
+                if slot_hash == key_hash:
+                    # Полное совпадение хешей: ключи хранятся в общем словаре
+                    bucket = {slot[1]: slot[2]} if type(slot) is tuple else dict(slot)
+                    added = key not in bucket
+                    bucket[key] = value
+                    node.slots[index] = bucket
+                else:
+                    child = self.Node(owner, [None] * self.WIDTH)
+                    child.slots[(slot_hash >> (shift + self.BITS)) & self.MASK] = slot
+                    node.slots[index], added = self._assoc(
+                        child, shift + self.BITS, key_hash, key, value, owner)
+            return node, added
+        
+        def delete(self, key, owner=None):
+            """Новая версия отображения без key (пустые узлы не сжимаются)"""
+            root, removed = self._dissoc(self._root, 0, self._hash(key), key, owner)
+            if not removed:
+                return self
+            return PersistentMap(root, self._size - 1)
+        
+        def _dissoc(self, node, shift, key_hash, key, owner):
+            index = (key_hash >> shift) & self.MASK
+            slot = node.slots[index]
+            if slot is None:
+                return node, False
+            if type(slot) is tuple:
+                if slot[1] != key:
+                    return node, False
+                replacement = None
+            elif type(slot) is dict:
+                if key not in slot:
+                    return node, False
+                replacement = {other: value for other, value in slot.items() if other != key}
+                if len(replacement) == 1:
+                    (other, value), = replacement.items()
+                    replacement = (key_hash, other, value)
+            else:
+                replacement, removed = self._dissoc(slot, shift + self.BITS, key_hash, key, owner)
+                if not removed:
+                    return node, False
+            node = self._editable(node, owner)
+            node.slots[index] = replacement
+            return node, True
+        
+        def __getitem__(self, key):
+            key_hash = self._hash(key)
+            node, shift = self._root, 0
+            while True:
+                slot = node.slots[(key_hash >> shift) & self.MASK]
+                if type(slot) is self.Node:
+                    node, shift = slot, shift + self.BITS
+                    continue
+                if type(slot) is tuple and slot[1] == key:
+                    return slot[2]
+                if type(slot) is dict and key in slot:
+                    return slot[key]
+                raise KeyError(key)
+        
+        def __iter__(self):
+            stack = [self._root]
+            while stack:
+                for slot in stack.pop().slots:
+                    if slot is None:
+                        continue
+                    if type(slot) is tuple:
+                        yield slot[1]
+                    elif type(slot) is dict:
+                        yield from slot
+                    else:
+                        stack.append(slot)
+        
+        def __len__(self):
+            return self._size
+    
+    class ReadReplica:
+        """
+        Копируемая при записи копия элементов и читателей для отчётов.
+        
+        Элементы и читатели хранятся записями to_record() в PersistentMap,
+        вместе с выданными элементами (item_id -> срок возврата),
+        счётчиками (категория, статус) и словами поиска (токен ->
+        PersistentMap item_id -> номер по порядку добавления). Между
+        снимками изменения идут на месте; snapshot() меняет токен
+        владения, и следующая запись копирует только путь к изменённому
+        ключу.
+        """
+        
+        def __init__(self, items, members):
+            self._owner = object()
+            self.items = PersistentMap()  # item_id -> запись элемента
+            self.members = PersistentMap()  # member_id -> запись читателя
+            self.loans = PersistentMap()  # item_id -> срок возврата (секунды epoch)
+            self.terms = PersistentMap()  # токен -> PersistentMap(item_id -> номер)
+            self.counts = Counter()  # (категория, статус) -> количество
+            self._fields = {}  # item_id -> поля поиска, уже внесённые в terms
+            self._order = {}  # item_id -> номер по порядку добавления
+            for item in items:
+                self.put_item(item)
+            for member in members:
+                self.put_member(member)
+        
+        def put_item(self, item):
+            """Записать текущее состояние элемента"""
+            record = item.to_record()
+            category = item.get_category()
+            old = self.items.get(item.item_id)
+            if old is not None:
+                self.counts[(category, old[5])] -= 1
+            self.counts[(category, record[5])] += 1
+            self.items = self.items.set(item.item_id, record, self._owner)
+            if record[5] == ItemStatus.BORROWED.value:
+                self.loans = self.loans.set(item.item_id, record[8], self._owner)
+            else:
+                self.loans = self.loans.delete(item.item_id, self._owner)
+            fields = item.get_search_fields()
+            if self._fields.get(item.item_id) != fields:
+                self._put_terms(item.item_id, fields)
+        
+        def _put_terms(self, item_id, fields):
+            """Перенести в terms разницу между старыми и новыми словами элемента"""
+            old_fields = self._fields.get(item_id)
+            old_tokens = Library._item_tokens(old_fields) if old_fields is not None else set()
+            new_tokens = Library._item_tokens(fields)
+            seq = self._order.setdefault(item_id, len(self._order))
+            terms = self.terms
+            for token in old_tokens - new_tokens:
+                posting = terms[token].delete(item_id, self._owner)
+                terms = (terms.set(token, posting, self._owner) if posting
+                         else terms.delete(token, self._owner))
+            for token in new_tokens - old_tokens:
+                posting = terms.get(token) or PersistentMap()
+                terms = terms.set(token, posting.set(item_id, seq, self._owner), self._owner)
+            self.terms = terms
+            self._fields[item_id] = fields
+        
+        def put_member(self, member):
+            """Записать текущее состояние читателя"""
+            self.members = self.members.set(member.member_id, member.to_record(), self._owner)
+        
+        def snapshot(self):
+            """Зафиксировать текущие версии; дальнейшие записи их не меняют"""
+            self._owner = object()
+            return self.items, self.members, self.loans, Counter(self.counts), self.terms
+    
+    class TransactionRollup:
+        """
+        Агрегаты журнала операций по минутам, часам и дням.
+        
+        Корзина — номер интервала от начала epoch (дни — по UTC); в ней
+        хранятся количество операций по типам и сумма amount. Запрос за
+        период перебирает только корзины этого периода, поэтому его
+        стоимость не зависит от длины истории. Мелкие корзины старше
+        срока хранения удаляются.
+        """
+        
+        LEVELS = (('day', 86400), ('hour', 3600), ('minute', 60))
+        TRACKED_PREFIXES = ("BORROW", "RETURN", "FINE", "ADD_")
+        DEFAULT_RETENTION = {'minute': timedelta(days=2), 'hour': timedelta(days=90)}
+        
+        def __init__(self, retention=None):
+            self._widths = dict(self.LEVELS)
+            self._retention = {name: period.total_seconds() for name, period
+                               in (self.DEFAULT_RETENTION if retention is None else retention).items()}
+            self._counts = {name: {} for name, _ in self.LEVELS}  # уровень -> корзина -> Counter
+            self._amounts = {name: {} for name, _ in self.LEVELS}  # уровень -> корзина -> Counter сумм
+        
+        def add(self, transaction_type, ts, amount=0.0):
+            """Учесть операцию с временем ts (секунды epoch)"""
+            if not transaction_type.startswith(self.TRACKED_PREFIXES):
+                return
+            for name, width in self.LEVELS:
+                bucket = int(ts // width)
+                counts = self._counts[name].get(bucket)
+                if counts is None:
+                    counts = self._counts[name][bucket] = Counter()
+                    self._prune(name, ts)
+                counts[transaction_type] += 1
+                if amount:
+                    amounts = self._amounts[name].setdefault(bucket, Counter())
+                    amounts[transaction_type] += amount
+        
+        def _prune(self, name, now):
+            """Удалить корзины уровня старше срока хранения"""
+            period = self._retention.get(name)
+            if period is None:
+                return
+            cutoff = int((now - period) // self._widths[name])
+            # Время в журнале не убывает, поэтому словари упорядочены по корзинам
+            for buckets in (self._counts[name], self._amounts[name]):
+                while buckets:
+                    oldest = next(iter(buckets))
+                    if oldest >= cutoff:
+                        break
+                    del buckets[oldest]
+        
+        def series(self, start, end, granularity='hour', transaction_type=None):
+            """
+            Ряд корзин уровня granularity, пересекающихся с [start, end).
+            
+            Для каждой корзины — (начало, количество операций transaction_type),
+            а без типа — (начало, Counter по всем типам).
+            """
+            if granularity not in self._widths:
+                raise ValueError(f"Неизвестная гранулярность: {granularity}")
+            width = self._widths[granularity]
+            buckets = self._counts[granularity]
+            first = int(start.timestamp() // width)
+            last = -int(-end.timestamp() // width)
+            result = []
+            for bucket in range(first, last):
+                counts = buckets.get(bucket)
+                if transaction_type is None:
+                    value = Counter(counts) if counts else Counter()
+                else:
+                    value = counts[transaction_type] if counts else 0
+                result.append((datetime.fromtimestamp(bucket * width), value))
+            return result
+        
+        def _cover(self, low, high, level=0):
+            """Покрыть минуты [low, high) корзинами, начиная с самых крупных"""
+            name, width = self.LEVELS[level]
+            span = width // 60  # ширина корзины в минутах
+            if span == 1:
+                yield name, low, high
+                return
+            first, last = -(-low // span), high // span
+            if first >= last:
+                yield from self._cover(low, high, level + 1)
+                return
+            yield from self._cover(low, first * span, level + 1)
+            yield name, first, last
+            yield from self._cover(last * span, high, level + 1)
+        
+        def totals(self, start, end):
+            """
+            Количество и сумма по типам операций за [start, end).
+            
+            Границы округляются вниз до минуты. Края окна берутся из
+            мелких корзин, поэтому за пределами их срока хранения
+            учитываются только целые часы и дни.
+            """
+            counts, amounts = Counter(), Counter()
+            low = int(start.timestamp() // 60)
+            high = int(end.timestamp() // 60)
+            for name, first, last in self._cover(low, high):
+                bucket_counts, bucket_amounts = self._counts[name], self._amounts[name]
+                for bucket in range(first, last):
+                    if bucket in bucket_counts:
+                        counts.update(bucket_counts[bucket])
+                    if bucket in bucket_amounts:
+                        amounts.update(bucket_amounts[bucket])
+            return counts, amounts
+    
+    class TransactionLog:
+        """
+        Компактный журнал операций с колоночным хранением.
+        
+        Запись — время (секунды epoch), код типа, индексы item_id и member_id
+        в таблице интернированных строк, сумма и количество. Описание
+        формируется только при чтении. Накопленные записи можно выгрузить
+        в файл, после чего они читаются через mmap. Каждая запись сразу
+        учитывается в агрегатах rollup; при заданном retention записи
+        старше этого срока удаляются из журнала.
+        """
+        
+        RECORD = struct.Struct("<dBiidi")  # timestamp, type, item, member, amount, count
+        NO_ID = -1
+        EVICTION_INTERVAL = 1024  # Проверять срок хранения раз в столько записей
+        
+        def __init__(self, renderer=None, rollup=None, retention=None):
+            self._renderer = renderer  # (type, item_id, member_id, amount, count) -> str
+            self._rollup = rollup  # TransactionRollup или None
+            self._retention = retention.total_seconds() if retention else None
+            self._appended = 0
+            self._evicted = 0  # Удалено записей по сроку хранения
+            self._types = []  # код -> тип операции
+            self._type_codes = {}  # тип операции -> код
+            self._ids = []  # индекс -> item_id / member_id
+            self._id_codes = {}  # item_id / member_id -> индекс
+            self._timestamps = array('d')
+            self._type_column = array('B')
+            self._item_column = array('i')
+            self._member_column = array('i')
+            self._amounts = array('d')
+            self._counts = array('i')
+            self._last_timestamp = 0.0
+            self._path = None  # Файл с выгруженными записями
+            self._segment = None  # mmap выгруженных записей
+            self._segment_rows = 0
+            self._segment_start = 0  # Удалённые записи в начале выгруженного файла
+        
+        @staticmethod
+        def _intern(table, codes, value):
+            """Код строки в таблице интернирования"""
+            code = codes.get(value)
+            if code is None:
+                code = codes[value] = len(table)
+                table.append(value)
+            return code
+        
+        def append(self, transaction_type, item_id=None, member_id=None,
+                   amount=0.0, count=0, timestamp=None):
+            """
+            Добавить запись.
+            
+            Журнал упорядочен по времени — на этом основан поиск по
+            диапазону. Запись с временем раньше последней (явный timestamp
+            или перевод часов назад) сохраняет своё время и вставляется на
+            место среди записей в памяти; раньше выгруженной в файл части
+            её не вставить — ValueError.
+            """
+            ts = (timestamp or datetime.now()).timestamp()
+            position = None
+            if ts < self._last_timestamp:
+                position = self._insert_position(ts)
+            else:
+                self._last_timestamp = ts
+            
+            type_code = self._intern(self._types, self._type_codes, transaction_type)
+            item_code = (self.NO_ID if item_id is None
+                         else self._intern(self._ids, self._id_codes, item_id))
+            member_code = (self.NO_ID if member_id is None
+                           else self._intern(self._ids, self._id_codes, member_id))
+            row = (ts, type_code, item_code, member_code, amount, count)
+            columns = (self._timestamps, self._type_column, self._item_column,
+                       self._member_column, self._amounts, self._counts)
+            if position is None:
+                for column, value in zip(columns, row):
+                    column.append(value)
+            else:
+                for column, value in zip(columns, row):
+                    column.insert(position, value)
+            if self._rollup is not None:
+                self._rollup.add(transaction_type, ts, amount)
+            
+            self._appended += 1
+            if self._retention is not None and self._appended % self.EVICTION_INTERVAL == 0:
+                self.evict_before(ts - self._retention)
+        
+        def _insert_position(self, ts):
+            """Место записи с временем ts среди записей в памяти (после равных)"""
+            archived = self._segment_rows - self._segment_start
+            if archived and self._timestamp(archived - 1) > ts:
+                raise ValueError("Запись раньше выгруженной в файл части журнала")
+            return bisect.bisect_right(self._timestamps, ts)
+        
+        def evict_before(self, ts):
+            """Удалить записи с временем раньше ts; агрегаты не меняются"""
+            count = self._bisect(ts)
+            from_segment = min(count, self._segment_rows - self._segment_start)
+            self._segment_start += from_segment
+            if count > from_segment:
+                for column in (self._timestamps, self._type_column, self._item_column,
+                               self._member_column, self._amounts, self._counts):
+                    del column[:count - from_segment]
+            self._evicted += count
+            return count
+        
+        @property
+        def evicted(self):
+            """Сколько записей удалено по сроку хранения"""
+            return self._evicted
+        
+        def _raw_row(self, index):
+            """Кортеж колонок записи без декодирования"""
+            index += self._segment_start
+            if index < self._segment_rows:
+                return self.RECORD.unpack_from(self._segment, index * self.RECORD.size)
+            index -= self._segment_rows
+            return (self._timestamps[index], self._type_column[index],
+                    self._item_column[index], self._member_column[index],
+                    self._amounts[index], self._counts[index])
+        
+        def _timestamp(self, index):
+            index += self._segment_start
+            if index < self._segment_rows:
+                return struct.unpack_from("<d", self._segment, index * self.RECORD.size)[0]
+            return self._timestamps[index - self._segment_rows]
+        
+        def _bisect(self, ts):
+            """Индекс первой записи с временем не раньше ts"""
+            low, high = 0, len(self)
+            while low < high:
+                middle = (low + high) // 2
+                if self._timestamp(middle) < ts:
+                    low = middle + 1
+                else:
+                    high = middle
+            return low
+        
+        def record(self, index):
+            """Запись журнала в виде TransactionRecord"""
+            ts, type_code, item_code, member_code, amount, count = self._raw_row(index)
+            return TransactionRecord(
+                datetime.fromtimestamp(ts),
+                self._types[type_code],
+                None if item_code == self.NO_ID else self._ids[item_code],
+                None if member_code == self.NO_ID else self._ids[member_code],
+                amount,
+                count)
+        
+        def between(self, start=None, end=None):
+            """Итерировать записи в полуинтервале [start, end) без создания словарей"""
+            first = self._bisect(start.timestamp()) if start else 0
+            last = self._bisect(end.timestamp()) if end else len(self)
+            for index in range(first, last):
+                yield self.record(index)
+        
+        def describe(self, record):
+            """Текстовое описание записи"""
+            if self._renderer is None:
+                return record.type
+            return self._renderer(record.type, record.item_id, record.member_id,
+                                  record.amount, record.count)
+        
+        def archive(self, path=None):
+            """Выгрузить записи из памяти в файл и читать их через mmap"""
+            path = path or self._path
+            if path is None:
+                raise ValueError("Не указан файл для выгрузки журнала")
+            if self._path is not None and path != self._path:
+                raise ValueError(f"Журнал уже выгружается в {self._path}")
+            if not self._timestamps:
+                return self._segment_rows
+            
+            pack = self.RECORD.pack
+            with open(path, 'ab' if self._path else 'wb') as log_file:
+                for row in zip(self._timestamps, self._type_column, self._item_column,
+                               self._member_column, self._amounts, self._counts):
+                    log_file.write(pack(*row))
+            for column in (self._timestamps, self._type_column, self._item_column,
+                           self._member_column, self._amounts, self._counts):
+                del column[:]
+            
+            self._path = path
+            if self._segment is not None:
+                self._segment.close()
+            with open(path, 'rb') as log_file:
+                self._segment = mmap.mmap(log_file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._segment_rows = len(self._segment) // self.RECORD.size
+            return self._segment_rows
+        
+        def close(self):
+            """Закрыть отображение выгруженного файла"""
+            if self._segment is not None:
+                self._segment.close()
+                self._segment = None
+        
+        def __len__(self):
+            return self._segment_rows - self._segment_start + len(self._timestamps)
+        
+        def __getitem__(self, index):
+            """Запись (или список записей для среза) в прежнем формате словаря"""
+            if isinstance(index, slice):
+                return [self[position] for position in range(*index.indices(len(self)))]
+            if index < 0:
+                index += len(self)
+            if not 0 <= index < len(self):
+                raise IndexError("Индекс записи вне журнала")
+            record = self.record(index)
+            return {
+                'timestamp': record.timestamp,
+                'type': record.type,
+                'description': self.describe(record)
+            }
+        
+        def __iter__(self):
+            for index in range(len(self)):
+                yield self[index]
     
     class Library:
         """Система управления библиотекой"""
         
-        def __init__(self, name: str):
+        _TRANSACTION_TEMPLATES = {
+            "ADD_ITEM": "Добавлен {item}",
+            "ADD_MEMBER": "Зарегистрирован {member}",
+            "BORROW": "{member_name} взял {item_title}",
+            "RETURN": "{member_name} вернул {item_title}",
+            "FINE": "Штраф {amount} для {member_name} за просрочку {count} дней",
+            "ADD_ITEMS_BULK": "Массово добавлено элементов: {count}",
+            "ADD_MEMBERS_BULK": "Массово зарегистрировано читателей: {count}",
+            "FINE_BATCH": "Пакетные штрафы {amount} по {count} элементам",
+            "RESERVE": "{member_name} зарезервировал {item_title}",
+            "HOLD_READY": "{item_title} отложен для {member_name}",
+        }
+        _EVENT_TYPES = {
+            "ADD_ITEM": ItemAdded,
+            "ADD_MEMBER": MemberAdded,
+            "BORROW": ItemBorrowed,
+            "RETURN": ItemReturned,
+            "FINE": MemberFined,
+        }
+        # Массовая загрузка публикует событие на каждую запись
+        _BULK_EVENTS = {"ADD_ITEMS_BULK": ("ADD_ITEM", "item_id"),
+                        "ADD_MEMBERS_BULK": ("ADD_MEMBER", "member_id")}
+        
+        def __init__(self, name: str, check_consistency: bool = False,
+                     thread_safe: bool = False, transaction_retention: timedelta = None,
+                     item_store: RecordStore = None):
             self.name = name
-            self._items = {}  # item_id -> Item
+            self._items = InMemoryStore() if item_store is None else item_store  # item_id -> Item
+            self._items.attach(self)
             self._members = {}  # member_id -> Member
-            self._transactions = []  # История операций
-            self._fine_rate = 1.0  # Штраф за день просрочки
+            self._rollup = TransactionRollup()  # Агрегаты операций по минутам, часам, дням
+            self._transactions = TransactionLog(  # История операций
+                self._describe_transaction, self._rollup, transaction_retention)
+            self._fine_engine = FineEngine(((1, 1.0),))  # Штраф 1.0 за каждый день просрочки
+            self._billed_days = {}  # item_id -> дни просрочки, уже выставленные к оплате
+            self._holds = {}  # item_id -> HoldQueue
+            self._hold_callbacks = {}  # (item_id, member_id) -> callback(item, member)
+            self._hold_listeners = []  # callback(item, member) для всех резервов
+            self._index = InvertedIndex()  # Токены названий, авторов, режиссёров
+            self._autocomplete = AutocompleteTrie()  # Те же токены для дополнения и опечаток
+            # False, пока индекс не построен: у снимка — до первого поиска, у
+            # хранилища с собственным поиском — до первого autocomplete
+            self._index_ready = not self._items.supports_search
+            self._snapshot = None  # SnapshotFile, если библиотека загружена из снимка
+            self._category_index = {}  # категория -> {item_id: None}
+            self._due_queue = DueDateQueue()  # Выданные элементы по сроку возврата
+            self._status_counts = Counter()  # ItemStatus -> количество
+            self._category_status_counts = defaultdict(Counter)  # категория -> ItemStatus -> количество
+            self._check_consistency = check_consistency  # Сверять счётчики со сканированием
+            # Потокобезопасный режим: блокировки на каждый элемент и читателя
+            # для check-then-act и короткая общая блокировка для индексов,
+            # счётчиков и журнала
+            self._thread_safe = thread_safe
+            self._item_locks = {}  # item_id -> Lock
+            self._member_locks = {}  # member_id -> Lock
+            self._state_lock = threading.RLock() if thread_safe else nullcontext()
+            self._replica = None  # ReadReplica, создаётся первым read_view()
+            self._events = EventBus()  # События изменений для подписчиков
+            if len(self._items):
+                self._restore_from_store()
+        
+        def _restore_from_store(self):
+            """Читатели, счётчики и сроки выдач для хранилища, уже содержащего элементы"""
+            for member in self._items.members():
+                self._members[member.member_id] = member
+                if self._thread_safe:
+                    self._member_locks[member.member_id] = threading.Lock()
+            for (category, status), count in self._items.status_counts().items():
+                self._category_status_counts[category][ItemStatus(status)] += count
+                self._status_counts[ItemStatus(status)] += count
+            for item_id, due_ts in self._items.loans():
+                self._due_queue.push(item_id, datetime.fromtimestamp(due_ts))
+                # Элемент связывается с читателем при чтении записи
+                item = self._items[item_id]
+                if item._borrowed_by is not None:
+                    item._borrowed_by._borrowed_items[item_id] = item
+            if self._thread_safe:
+                for item_id in self._items:
+                    self._item_locks[item_id] = threading.Lock()
+            if not self._items.supports_search:
+                self._index_ready = False
         
         def add_item(self, item: Item):
             """Добавить элемент в библиотеку"""
-            if item.item_id in self._items:
-                raise ValueError(f"Элемент с ID {item.item_id} уже существует")
-            
-            self._items[item.item_id] = item
-            self._log_transaction("ADD_ITEM", f"Добавлен {item}")
-            return f"Элемент добавлен: {item}"
+            with self._state_lock:
+                if item.item_id in self._items:
+                    raise ValueError(f"Элемент с ID {item.item_id} уже существует")
+                self._register_item(item)
+            self._log_transaction("ADD_ITEM", item_id=item.item_id)
+            return ResultMessage("Элемент добавлен: {item}", item=item)
         
         def add_member(self, member: Member):
             """Добавить читателя"""
-            if member.member_id in self._members:
-                raise ValueError(f"Читатель с ID {member.member_id} уже существует")
+            with self._state_lock:
+                if member.member_id in self._members:
+                    raise ValueError(f"Читатель с ID {member.member_id} уже существует")
+                self._register_member(member)
+            self._log_transaction("ADD_MEMBER", member_id=member.member_id)
+            return ResultMessage("Читатель зарегистрирован: {member}", member=member)
+        
+        def add_items_bulk(self, items, factory=None, batch_size: int = 1000):
+            """
+            Массово добавить элементы из итерируемого источника.
             
-            self._members[member.member_id] = member
-            self._log_transaction("ADD_MEMBER", f"Зарегистрирован {member}")
-            return f"Читатель зарегистрирован: {member}"
+            Источник читается пачками по batch_size, поэтому подходит и поток
+            (например, csv.reader вместе с factory, превращающей строку в Item).
+            Пачка проверяется целиком до вставки: при ошибке в библиотеке
+            остаются только предыдущие пачки. В журнал пишется одна итоговая
+            запись. Возвращает количество добавленных элементов.
+            """
+            return self._add_bulk(items, factory, batch_size, self._items,
+                                  lambda item: item.item_id, self._register_item,
+                                  "Элемент", "ADD_ITEMS_BULK")
+        
+        def add_members_bulk(self, members, factory=None, batch_size: int = 1000):
+            """Массово зарегистрировать читателей (см. add_items_bulk)"""
+            return self._add_bulk(members, factory, batch_size, self._members,
+                                  lambda member: member.member_id, self._register_member,
+                                  "Читатель", "ADD_MEMBERS_BULK")
+        
+        def _add_bulk(self, records, factory, batch_size, existing, get_id, register,
+                      label, transaction_type):
+            """Общая часть массовой загрузки элементов и читателей"""
+            if batch_size < 1:
+                raise ValueError("Размер пачки должен быть положительным")
+            
+            iterator = iter(records)
+            added = 0
+            try:
+                while True:
+                    batch = list(itertools.islice(iterator, batch_size))
+                    if not batch:
+                        break
+                    if factory is not None:
+                        batch = [factory(record) for record in batch]
+                    
+                    with self._state_lock:
+                        # Проверка всей пачки за один проход до вставки
+                        seen = set()
+                        for record in batch:
+                            record_id = get_id(record)
+                            if record_id in existing or record_id in seen:
+                                raise ValueError(f"{label} с ID {record_id} уже существует")
+                            seen.add(record_id)
+                        
+                        for record in batch:
+                            register(record)
+                        record_type, id_field = self._BULK_EVENTS[transaction_type]
+                        events = []
+                        if self._events.wants(self._EVENT_TYPES[record_type]):
+                            events = [self._make_event(record_type, **{id_field: get_id(record)})
+                                      for record in batch]
+                    added += len(batch)
+                    self._events.publish(events)
+            finally:
+                if added:
+                    self._log_transaction(transaction_type, count=added)
+            return added
         
         def borrow_item(self, item_id: str, member_id: str):
             """Выдать элемент читателю"""
@@ -333,13 +2367,16 @@ def exercise_01_library_management_system():
             if not member:
                 raise ValueError(f"Читатель с ID {member_id} не найден")
             
-            if not member.can_borrow():
-                raise ValueError(f"Читатель {member.name} не может взять книги (превышен лимит или есть штрафы)")
-            
-            result = item.borrow(member, item.get_loan_period())
-            member.add_borrowed_item(item)
+            with self._locked(member_id, item_id):
+                if not member.can_borrow():
+                    raise ValueError(f"Читатель {member.name} не может взять книги (превышен лимит или есть штрафы)")
+                
+                result = item.borrow(member, item.get_loan_period())
+                member.add_borrowed_item(item)
+                self._items.save_member(member)
+            self._hold_callbacks.pop((item_id, member_id), None)
             
-            self._log_transaction("BORROW", f"{member.name} взял {item.title}")
+            self._log_transaction("BORROW", item_id, member_id)
             return result
         
         def return_item(self, item_id: str):
@@ -348,47 +2385,328 @@ def exercise_01_library_management_system():
             if not item:
                 raise ValueError(f"Элемент с ID {item_id} не найден")
             
-            if item.status != ItemStatus.BORROWED:
-                raise ValueError("Элемент не был выдан")
+            while True:
+                member = item._borrowed_by
+                if item.status != ItemStatus.BORROWED or member is None:
+                    raise ValueError("Элемент не был выдан")
+                
+                with self._locked(member.member_id, item_id):
+                    # До захвата блокировок элемент мог вернуть и выдать другой поток
+                    if item._borrowed_by is not member:
+                        continue
+                    
+                    # Проверяем просрочку; уже выставленные дни не начисляются повторно
+                    billed_days = self._billed_days.pop(item_id, 0)
+                    overdue_days = 0
+                    if item.is_overdue():
+                        overdue_days = self._fine_engine.overdue_days(item._due_date, datetime.now())
+                    if overdue_days:
+                        category = item.get_category()
+                        fine = max(self._fine_engine.fine_for_days(overdue_days, category)
+                                   - self._fine_engine.fine_for_days(billed_days, category), 0.0)
+                        member.add_fine(fine)
+                        self._log_transaction("FINE", item_id, member.member_id,
+                                              amount=fine, count=overdue_days)
+                    
+                    result = item.return_item()
+                    member.remove_borrowed_item(item)
+                    self._items.save_member(member)
+                    holder = self._promote_hold(item)
+                break
             
-            member = item._borrowed_by
+            self._log_transaction("RETURN", item_id, member.member_id)
+            self._notify_hold(item, holder)
+            return result
+        
+        def reserve_item(self, item_id: str, member_id: str, callback=None):
+            """
+            Зарезервировать элемент.
             
-            # Проверяем просрочку
-            if item.is_overdue():
-                overdue_days = (datetime.now() - item._due_date).days
-                fine = overdue_days * self._fine_rate
-                member.add_fine(fine)
-                self._log_transaction("FINE", f"Штраф {fine} для {member.name} за просрочку {overdue_days} дней")
+            Свободный элемент без очереди сразу откладывается для читателя,
+            иначе читатель встаёт в конец очереди. Когда элемент будет
+            отложен, вызывается callback(item, member) и подписчики
+            subscribe_holds. Возвращает позицию в очереди (0 — уже отложен).
+            """
+            item = self._items.get(item_id)
+            member = self._members.get(member_id)
+            if not item:
+                raise ValueError(f"Элемент с ID {item_id} не найден")
+            if not member:
+                raise ValueError(f"Читатель с ID {member_id} не найден")
             
-            result = item.return_item()
-            member.remove_borrowed_item(item)
+            with self._locked(member_id, item_id), self._state_lock:
+                if member.has_borrowed(item) or item.reserved_for == member:
+                    raise ValueError(f"Элемент {item_id} уже у читателя {member.name}")
+                queue = self._holds.setdefault(item_id, HoldQueue())
+                if item.is_available and not queue:
+                    item.hold(member)
+                    holder, position = member, 0
+                else:
+                    holder, position = None, queue.push(member_id)
+                # Колбэк регистрируем только для принятого резерва
+                if callback is not None:
+                    self._hold_callbacks[(item_id, member_id)] = callback
+            self._log_transaction("RESERVE", item_id, member_id)
+            self._notify_hold(item, holder)
+            return position
+        
+        def cancel_reservation(self, item_id: str, member_id: str):
+            """Отменить резерв; отложенный элемент переходит следующему в очереди"""
+            item = self._items.get(item_id)
+            if not item:
+                raise ValueError(f"Элемент с ID {item_id} не найден")
+            if member_id not in self._members:
+                raise ValueError(f"Читатель с ID {member_id} не найден")
+            with self._locked(member_id, item_id), self._state_lock:
+                holder = None
+                if item.reserved_for is not None and item.reserved_for.member_id == member_id:
+                    item.release_hold()
+                    holder = self._promote_hold(item)
+                elif not self._holds.get(item_id, HoldQueue()).cancel(member_id):
+                    raise ValueError(f"У читателя {member_id} нет резерва на {item_id}")
+                self._hold_callbacks.pop((item_id, member_id), None)
+                self._replicate((item_id,))
+            self._notify_hold(item, holder)
+        
+        def queue_position(self, item_id: str, member_id: str):
+            """Позиция читателя в очереди: 0 — элемент отложен для него, None — резерва нет"""
+            item = self._items.get(item_id)
+            if item is not None and item.reserved_for is not None \
+                    and item.reserved_for.member_id == member_id:
+                return 0
+            queue = self._holds.get(item_id)
+            return queue.position(member_id) if queue is not None else None
+        
+        def subscribe_holds(self, callback):
+            """Подписаться на все отложенные резервы: callback(item, member)"""
+            self._hold_listeners.append(callback)
+        
+        def _promote_hold(self, item: Item):
+            """Отложить освободившийся элемент для следующего в очереди"""
+            with self._state_lock:
+                queue = self._holds.get(item.item_id)
+                member_id = queue.pop() if queue else None
+                if member_id is None:
+                    return None
+                member = self._members[member_id]
+                item.hold(member)
+                return member
+        
+        def _notify_hold(self, item: Item, member):
+            """Уведомить читателя и подписчиков, что элемент отложен"""
+            if member is None:
+                return
+            self._log_transaction("HOLD_READY", item.item_id, member.member_id)
+            callback = self._hold_callbacks.get((item.item_id, member.member_id))
+            if callback is not None:
+                callback(item, member)
+            for listener in self._hold_listeners:
+                listener(item, member)
+        
+        def set_fine_policy(self, tiers, category_rates=None):
+            """Задать ступенчатые ставки штрафа и коэффициенты категорий"""
+            self._fine_engine = FineEngine(tiers, category_rates)
+        
+        def _batch_fines(self, items, today: datetime):
+            """Новые (ещё не выставленные) штрафы и дни просрочки для пакета элементов"""
+            engine = self._fine_engine
+            count = len(items)
+            due_times = np.fromiter((engine.epoch_microseconds(item._due_date) for item in items),
+                                    dtype=np.int64, count=count)
+            billed_days = np.fromiter((self._billed_days.get(item.item_id, 0) for item in items),
+                                      dtype=np.int64, count=count)
+            multipliers = np.fromiter((engine.category_rate(item.get_category()) for item in items),
+                                      dtype=np.float64, count=count)
+            # Как overdue_days: floor((today - due) / сутки), не меньше нуля
+            overdue_days = np.maximum(
+                (engine.epoch_microseconds(today) - due_times) // engine.MICROSECONDS_PER_DAY, 0)
+            fines = np.maximum(engine.fines(overdue_days, multipliers)
+                               - engine.fines(billed_days, multipliers), 0.0)
+            return fines, overdue_days
+        
+        def _apply_fines(self, items, fines, overdue_days):
+            """Начислить штрафы читателям за один проход; возвращает member_id -> сумма"""
+            member_codes = {}
+            codes = np.fromiter(
+                (member_codes.setdefault(item._borrowed_by.member_id, len(member_codes))
+                 for item in items), dtype=np.int64, count=len(items))
+            totals = np.bincount(codes, weights=fines, minlength=len(member_codes))
+            charged = {}
+            for member_id, code in member_codes.items():
+                amount = float(totals[code])
+                if amount > 0:
+                    member = self._members[member_id]
+                    member.add_fine(amount)
+                    self._items.save_member(member)
+                    charged[member_id] = amount
+            for item, days in zip(items, overdue_days.tolist()):
+                if days:
+                    self._billed_days[item.item_id] = days
+            if charged:
+                self._log_transaction("FINE_BATCH", amount=float(fines.sum()),
+                                      count=int(np.count_nonzero(fines)))
+                self._replicate(member_ids=charged)
+            return charged
+        
+        def charge_overdue_fines(self, today: datetime = None):
+            """
+            Выставить штрафы по всем просроченным выдачам (закрытие дня).
             
-            self._log_transaction("RETURN", f"{member.name} вернул {item.title}")
-            return result
+            Повторный вызов в тот же день ничего не начисляет: учитываются
+            только дни, ещё не выставленные к оплате. Как и return_items_bulk,
+            берёт блокировки всех штрафуемых читателей и их элементов до
+            общей, поэтому не пересекается с return_item. Возвращает словарь
+            member_id -> начисленная сумма.
+            """
+            today = today or datetime.now()
+            while True:
+                with self._state_lock:
+                    items = [self._items[item_id]
+                             for item_id in list(self._due_queue.pop_expired(today))]
+                if not items:
+                    return {}
+                members = [item._borrowed_by for item in items]
+                if any(member is None for member in members):
+                    continue  # Элемент как раз возвращается другим потоком
+                
+                with self._locked_many([member.member_id for member in members],
+                                       [item.item_id for item in items]), self._state_lock:
+                    # До захвата блокировок элемент мог вернуть и выдать другой поток
+                    if any(item._borrowed_by is not member
+                           for item, member in zip(items, members)):
+                        continue
+                    fines, overdue_days = self._batch_fines(items, today)
+                    charged = self._apply_fines(items, fines, overdue_days)
+                break
+            self._publish_fines(charged)
+            return charged
+        
+        def return_items_bulk(self, item_ids):
+            """
+            Вернуть пакет элементов, посчитав штрафы одним векторным расчётом.
+            
+            Дни просрочки — полные сутки после срока, как в return_item
+            и при закрытии дня. Блокировки читателей и элементов пакета
+            берутся все сразу (см. _locked_many). Возвращает словарь
+            member_id -> начисленный штраф.
+            """
+            items = []
+            for item_id in dict.fromkeys(item_ids):
+                item = self._items.get(item_id)
+                if not item:
+                    raise ValueError(f"Элемент с ID {item_id} не найден")
+                items.append(item)
+            if not items:
+                return {}
+            
+            while True:
+                members = [item._borrowed_by for item in items]
+                for item, member in zip(items, members):
+                    if item.status != ItemStatus.BORROWED or member is None:
+                        raise ValueError(f"Элемент {item.item_id} не был выдан")
+                
+                with self._locked_many([member.member_id for member in members],
+                                       [item.item_id for item in items]), self._state_lock:
+                    # До захвата блокировок элемент мог вернуть и выдать другой поток
+                    if any(item._borrowed_by is not member
+                           for item, member in zip(items, members)):
+                        continue
+                    
+                    fines, overdue_days = self._batch_fines(items, datetime.now())
+                    charged = self._apply_fines(items, fines, overdue_days)
+                    holders = []
+                    for item, member in zip(items, members):
+                        self._billed_days.pop(item.item_id, None)
+                        item.return_item()
+                        member.remove_borrowed_item(item)
+                        self._items.save_member(member)
+                        holders.append(self._promote_hold(item))
+                break
+            
+            self._publish_fines(charged)
+            for item, member, holder in zip(items, members, holders):
+                self._log_transaction("RETURN", item.item_id, member.member_id)
+                self._notify_hold(item, holder)
+            return charged
         
         def search_items(self, query: str, category: str = None):
-            """Поиск элементов"""
-            results = []
-            query_lower = query.lower()
+            """
+            Поиск элементов по словам названия, автора и режиссёра.
             
-            for item in self._items.values():
-                if category and item.get_category() != category:
-                    continue
-                
-                if (query_lower in item.title.lower() or 
-                    (hasattr(item, 'author') and query_lower in item.author.lower()) or
-                    (hasattr(item, 'director') and query_lower in item.director.lower())):
-                    results.append(item)
+            Каждое слово запроса должно быть началом слова элемента ("пит"
+            находит "Питон"). Просматриваются только posting-листы слов с
+            этими префиксами и категории.
+            """
+            tokens = set(InvertedIndex.tokenize(query))
+            with self._state_lock:
+                if not tokens and not category:
+                    return list(self._items.values())
+                return [self._items[item_id] for item_id in self._matching_ids(tokens, category)]
+        
+        def search_items_many(self, queries):
+            """
+            Ответить на пачку поисков (query, category) одним проходом.
+            
+            Все запросы видят одно состояние индекса: общая блокировка
+            берётся один раз на пачку, а posting-лист каждого префикса
+            строится один раз и переиспользуется запросами с тем же словом.
+            Возвращает списки элементов в порядке запросов.
+            """
+            parsed = [(set(InvertedIndex.tokenize(query)), category) for query, category in queries]
+            shared = {}  # префикс -> posting-лист для всей пачки
+            with self._state_lock:
+                return [list(self._items.values()) if not tokens and not category
+                        else [self._items[item_id]
+                              for item_id in self._matching_ids(tokens, category, shared)]
+                        for tokens, category in parsed]
+        
+        def _matching_ids(self, tokens, category: str = None, shared=None):
+            """
+            ID элементов с префиксами tokens и категорией (под _state_lock).
             
-            return results
+            shared — словарь posting-листов префиксов, общий для пачки запросов.
+            """
+            if self._items.supports_search:
+                return self._items.search(tokens, category)
+            self._ensure_index()
+            if shared is None:
+                shared = {}
+            postings = [shared[token] if token in shared
+                        else shared.setdefault(token, self._index.get_prefix(token))
+                        for token in tokens]
+            if category:
+                postings.append(self._category_index.get(category, InvertedIndex._EMPTY))
+            return list(InvertedIndex.intersect(postings))
+        
+        def autocomplete(self, query: str, k: int = 10, max_distance: int = 1,
+                         budget_ms: float = 1.0):
+            """
+            Подсказки для строки поиска.
+            
+            Последнее слово запроса — префикс (допускаются опечатки до
+            max_distance правок), предыдущие слова должны совпасть точно.
+            Возвращает до k элементов; по истечении budget_ms возвращается
+            то, что успели найти.
+            """
+            tokens = InvertedIndex.tokenize(query)
+            if not tokens:
+                return []
+            *exact_tokens, prefix = tokens
+            with self._state_lock:
+                self._ensure_index()  # Разовое построение индекса не входит в бюджет
+                deadline = time.perf_counter() + budget_ms / 1000
+                allowed = None
+                if exact_tokens:
+                    allowed = set(InvertedIndex.intersect(
+                        [self._index.get(token) for token in set(exact_tokens)]))
+                ranked = self._autocomplete.complete(prefix, k, max_distance, deadline, allowed)
+                return [self._items[item_id] for item_id in ranked]
         
         def get_overdue_items(self):
-            """Получить просроченные элементы"""
-            overdue = []
-            for item in self._items.values():
-                if item.is_overdue():
-                    overdue.append(item)
-            return overdue
+            """Получить просроченные элементы (в порядке срока возврата)"""
+            with self._state_lock:
+                expired = self._due_queue.pop_expired(datetime.now())
+                return [self._items[item_id] for item_id in expired]
         
         def get_member_info(self, member_id: str):
             """Получить информацию о читателе"""
@@ -398,7 +2716,7 @@ def exercise_01_library_management_system():
             
             info = {
                 'member': member,
-                'borrowed_count': len(member.borrowed_items),
+                'borrowed_count': member.borrowed_count,
                 'borrowed_items': member.borrowed_items,
                 'fine_amount': member.fine_amount,
                 'can_borrow': member.can_borrow()
@@ -406,40 +2724,1204 @@ def exercise_01_library_management_system():
             return info
         
         def get_statistics(self):
-            """Получить статистику библиотеки"""
-            total_items = len(self._items)
-            available_items = sum(1 for item in self._items.values() if item.is_available)
-            borrowed_items = total_items - available_items
-            total_members = len(self._members)
-            overdue_items = len(self.get_overdue_items())
+            """Получить статистику библиотеки по поддерживаемым счётчикам"""
+            with self._state_lock:
+                total_items = len(self._items)
+                available_items = self._status_counts[ItemStatus.AVAILABLE]
+                borrowed_items = total_items - available_items
+                total_members = len(self._members)
+                overdue_items = len(self._due_queue.pop_expired(datetime.now()))
+                
+                stats = {
+                    'total_items': total_items,
+                    'available_items': available_items,
+                    'borrowed_items': borrowed_items,
+                    'total_members': total_members,
+                    'overdue_items': overdue_items,
+                    'transactions_count': len(self._transactions),
+                    'by_status': {status.value: count
+                                  for status, count in self._status_counts.items() if count},
+                    'by_category': {category: sum(counts.values())
+                                    for category, counts in self._category_status_counts.items()}
+                }
+            if self._check_consistency:
+                self.verify_statistics(stats)
+            return stats
+        
+        def verify_statistics(self, stats=None):
+            """Сверить счётчики с полным сканированием элементов (для тестов)"""
+            stats = stats or self.get_statistics()
+            by_status, by_category = Counter(), Counter()
+            for (category, status), count in self._items.status_counts().items():
+                by_status[status] += count
+                by_category[category] += count
+            overdue = len(self._items.due_before(datetime.now().timestamp()))
+            expected = {
+                'available_items': by_status[ItemStatus.AVAILABLE.value],
+                'overdue_items': overdue,
+                'by_status': dict(by_status),
+                'by_category': dict(by_category)
+            }
+            for key, value in expected.items():
+                if stats[key] != value:
+                    raise RuntimeError(f"Рассинхронизация статистики '{key}': "
+                                       f"{stats[key]} != {value}")
+            return True
+        
+        def _register_item(self, item: Item):
+            """Сохранить элемент и обновить индексы и счётчики"""
+            self._items[item.item_id] = item
+            if self._thread_safe:
+                self._item_locks[item.item_id] = threading.Lock()
+            item._library = self
+            if self._index_ready:
+                self._index_item(item)
+            self._status_counts[item.status] += 1
+            self._category_status_counts[item.get_category()][item.status] += 1
+            if item.status == ItemStatus.BORROWED:
+                self._due_queue.push(item.item_id, item._due_date)
+            if self._replica is not None:
+                self._replica.put_item(item)
+        
+        def _link_item(self, item: Item, values):
+            """Связать восстановленный из записи элемент с читателями"""
+            if values[6] is not None:
+                item._borrowed_by = self._members[values[6]]
+            if values[9] is not None:
+                item._reserved_for = self._members[values[9]]
+        
+        def _register_member(self, member: Member):
+            """Сохранить читателя"""
+            self._members[member.member_id] = member
+            if self._thread_safe:
+                self._member_locks[member.member_id] = threading.Lock()
+            self._items.save_member(member)
+            if self._replica is not None:
+                self._replica.put_member(member)
+        
+        @contextmanager
+        def _locked(self, member_id: str, item_id: str):
+            """
+            Захватить блокировки читателя и элемента.
+            
+            Порядок всегда один — сначала читатель, затем элемент, — поэтому
+            два потока не могут взаимно заблокироваться на одних элементах.
+            """
+            if not self._thread_safe:
+                yield
+                return
+            with self._member_locks[member_id], self._item_locks[item_id]:
+                yield
+        
+        @contextmanager
+        def _locked_many(self, member_ids, item_ids):
+            """
+            Захватить блокировки нескольких читателей и элементов.
+            
+            Порядок согласован с _locked: сначала все читатели, затем все
+            элементы, внутри каждой группы — по возрастанию ID.
+            """
+            if not self._thread_safe:
+                yield
+                return
+            with ExitStack() as stack:
+                for member_id in sorted(set(member_ids)):
+                    stack.enter_context(self._member_locks[member_id])
+                for item_id in sorted(set(item_ids)):
+                    stack.enter_context(self._item_locks[item_id])
+                yield
+        
+        @staticmethod
+        def _item_tokens(fields):
+            """Множество токенов для набора полей элемента"""
+            tokens = set()
+            for field in fields:
+                tokens.update(InvertedIndex.tokenize(field))
+            return tokens
+        
+        def _index_item(self, item: Item):
+            """Добавить элемент в поисковый индекс и индекс категорий"""
+            tokens = self._item_tokens(item.get_search_fields())
+            self._index.add(item.item_id, tokens)
+            for token in tokens:
+                self._autocomplete.add(token, item.item_id)
+            self._category_index.setdefault(item.get_category(), {})[item.item_id] = None
+        
+        def _on_item_status_changed(self, item: Item, old_status: ItemStatus):
+            """Обновить счётчики и очередь сроков возврата при смене статуса"""
+            status = item.status
+            with self._state_lock:
+                self._items.save(item)
+                category_counts = self._category_status_counts[item.get_category()]
+                self._status_counts[old_status] -= 1
+                self._status_counts[status] += 1
+                category_counts[old_status] -= 1
+                category_counts[status] += 1
+                
+                if status == ItemStatus.BORROWED:
+                    self._due_queue.push(item.item_id, item._due_date)
+                elif old_status == ItemStatus.BORROWED:
+                    self._due_queue.discard(item.item_id)
+        
+        def _ensure_index(self):
+            """Построить поисковый индекс библиотеки, загруженной из снимка"""
+            if not self._index_ready:
+                for item in self._items.values():
+                    self._index_item(item)
+                self._index_ready = True
+        
+        def _on_item_title_changed(self, item: Item, old_title: str):
+            """Переиндексировать элемент после смены названия"""
+            self._items.reindex(item)
+            self._replicate((item.item_id,))
+            if not self._index_ready:
+                return
+            new_fields = item.get_search_fields()
+            old_tokens = self._item_tokens((old_title,) + new_fields[1:])
+            new_tokens = self._item_tokens(new_fields)
+            with self._state_lock:
+                self._index.remove(item.item_id, old_tokens - new_tokens)
+                self._index.add(item.item_id, new_tokens - old_tokens)
+                for token in old_tokens - new_tokens:
+                    self._autocomplete.remove(token, item.item_id)
+                for token in new_tokens - old_tokens:
+                    self._autocomplete.add(token, item.item_id)
+        
+        def _log_transaction(self, transaction_type: str, item_id: str = None,
+                             member_id: str = None, amount: float = 0.0, count: int = 0):
+            """Записать транзакцию (описание формируется при чтении)"""
+            with self._state_lock:
+                self._transactions.append(transaction_type, item_id, member_id, amount, count)
+                # Элемент и читатель операции попадают в реплику вместе
+                if self._replica is not None:
+                    self._replicate((item_id,) if item_id else (),
+                                    (member_id,) if member_id else ())
+                event = self._make_event(transaction_type, item_id, member_id, amount)
+            # Публикация вне общей блокировки: подписчик с политикой block
+            # не останавливает остальные операции библиотеки
+            if event is not None:
+                self._events.publish((event,))
+        
+        def subscribe_events(self, capacity: int = 1024, policy: str = 'drop_oldest',
+                             event_types=None, block_timeout: float = None):
+            """
+            Подписаться на события изменений (ItemAdded, ItemBorrowed,
+            ItemReturned, MemberFined, MemberAdded).
+            
+            Возвращает EventSubscription с кольцом на capacity событий и
+            политикой переполнения drop_oldest, drop_newest или block.
+            Порядок событий одного элемента определяет seq: при публикации
+            из разных потоков события могут прийти в кольцо не по порядку.
+            """
+            return self._events.subscribe(capacity, policy, event_types, block_timeout)
+        
+        def _make_event(self, transaction_type: str, item_id: str = None,
+                        member_id: str = None, amount: float = 0.0):
+            """Событие операции (под _state_lock) или None, если на него никто не подписан"""
+            event_type = self._EVENT_TYPES.get(transaction_type)
+            if event_type is None or not self._events.wants(event_type):
+                return None
+            seq, now = self._events.next_sequence(), datetime.now()
+            if event_type is ItemAdded:
+                item = self._items[item_id]
+                return ItemAdded(seq, now, item_id, item.get_category(), item.status.value)
+            if event_type is ItemBorrowed:
+                return ItemBorrowed(seq, now, item_id, member_id, self._items[item_id]._due_date)
+            if event_type is ItemReturned:
+                return ItemReturned(seq, now, item_id, member_id, self._items[item_id].status.value)
+            if event_type is MemberFined:
+                return MemberFined(seq, now, member_id, item_id, amount)
+            return MemberAdded(seq, now, member_id)
+        
+        def _publish_fines(self, charged):
+            """События пакетных штрафов: по одному на читателя"""
+            events = [self._make_event("FINE", member_id=member_id, amount=amount)
+                      for member_id, amount in charged.items()]
+            self._events.publish(event for event in events if event is not None)
+        
+        def _replicate(self, item_ids=(), member_ids=()):
+            """Перенести изменённые элементы и читателей в реплику для чтения"""
+            if self._replica is None:
+                return
+            with self._state_lock:
+                for item_id in item_ids:
+                    item = self._items.get(item_id)
+                    if item is not None:
+                        self._replica.put_item(item)
+                for member_id in member_ids:
+                    member = self._members.get(member_id)
+                    if member is not None:
+                        self._replica.put_member(member)
+        
+        def read_view(self):
+            """
+            Согласованное представление для отчётов (LibraryView).
+            
+            Первый вызов строит реплику за один проход; дальше запись
+            копирует только путь к изменённому элементу или читателю.
+            Изменения читателя в обход методов библиотеки (например,
+            Member.pay_fine) попадают в реплику со следующей его операцией.
+            """
+            with self._state_lock:
+                if self._replica is None:
+                    self._replica = ReadReplica(self._items.values(), self._members.values())
+                items, members, loans, counts, terms = self._replica.snapshot()
+                return LibraryView(items, members, loans, counts, terms, len(self._transactions))
+        
+        def _describe_transaction(self, transaction_type, item_id, member_id, amount, count):
+            """Сформировать описание транзакции по текущим данным библиотеки"""
+            template = self._TRANSACTION_TEMPLATES.get(transaction_type)
+            if template is None:
+                return transaction_type
+            item = self._items.get(item_id) if item_id is not None else None
+            member = self._members.get(member_id) if member_id is not None else None
+            return template.format(
+                item=item or item_id,
+                item_title=item.title if item else item_id,
+                member=member or member_id,
+                member_name=member.name if member else member_id,
+                amount=amount,
+                count=count)
+        
+        def get_transactions(self, start: datetime = None, end: datetime = None):
+            """Транзакции за период [start, end) с описаниями"""
+            return [(record, self._transactions.describe(record))
+                    for record in self._transactions.between(start, end)]
+        
+        def transaction_series(self, start: datetime, end: datetime,
+                               granularity: str = 'hour', transaction_type: str = None):
+            """Количество операций по корзинам minute/hour/day за [start, end)"""
+            with self._state_lock:
+                return self._rollup.series(start, end, granularity, transaction_type)
+        
+        def transaction_totals(self, start: datetime, end: datetime):
+            """Итоги операций за [start, end): тип -> количество и сумма"""
+            with self._state_lock:
+                counts, amounts = self._rollup.totals(start, end)
+            return {transaction_type: {'count': count, 'amount': amounts[transaction_type]}
+                    for transaction_type, count in counts.items()}
+        
+        def archive_transactions(self, path: str):
+            """Выгрузить журнал операций в файл, отображаемый через mmap"""
+            return self._transactions.archive(path)
+        
+        def save_snapshot(self, path: str):
+            """
+            Сохранить элементы, читателей и счётчики в двоичный снимок.
+            
+            Журнал операций и очереди резервов в снимок не входят;
+            сохраняется только то, для кого отложен элемент. Политика
+            штрафов и уже выставленные дни просрочки сохраняются, чтобы
+            закрытие дня после загрузки не начислило их повторно.
+            """
+            with self._state_lock:
+                tiers = [(int(start), float(rate)) for start, rate in self._fine_engine.tiers]
+                category_rates = [(category, float(rate)) for category, rate
+                                  in self._fine_engine.category_rates.items()]
+                billed = list(self._billed_days.items())
+                counts = [(category, status.value, count)
+                          for category, status_counts in self._category_status_counts.items()
+                          for status, count in status_counts.items() if count]
+                loans = [(item_id, due_date.timestamp())
+                         for item_id, due_date in self._due_queue.items()]
+                meta = (self.name, len(tiers), len(category_rates), len(billed), len(counts),
+                        *itertools.chain.from_iterable(tiers),
+                        *itertools.chain.from_iterable(category_rates),
+                        *itertools.chain.from_iterable(billed),
+                        *itertools.chain.from_iterable(counts),
+                        *itertools.chain.from_iterable(loans))
+                SnapshotFile.write(
+                    path,
+                    ((item_id, item.to_record()) for item_id, item in self._items.items()),
+                    ((member_id, member.to_record()) for member_id, member in self._members.items()),
+                    meta)
+        
+        @classmethod
+        def load_snapshot(cls, path: str, check_consistency: bool = False,
+                          thread_safe: bool = False):
+            """
+            Открыть снимок без чтения каталога целиком.
+            
+            Элементы и читатели декодируются при первом обращении,
+            счётчики и очередь сроков возврата берутся из метаданных,
+            поисковый индекс строится при первом поиске. С thread_safe=True
+            библиотека потокобезопасна, как созданная конструктором.
+            """
+            snapshot = SnapshotFile(path)
+            (name, tiers_len, category_len, billed_len, counts_len,
+             *rest) = snapshot.meta
+            library = cls(name, check_consistency=check_consistency, thread_safe=thread_safe)
             
+            def pairs(count):
+                nonlocal rest
+                values, rest = rest[:count * 2], rest[count * 2:]
+                return list(zip(values[::2], values[1::2]))
+            
+            library.set_fine_policy(pairs(tiers_len), dict(pairs(category_len)))
+            library._billed_days = dict(pairs(billed_len))
+            library._snapshot = snapshot
+            library._index_ready = False
+            
+            def build_item(values):
+                item = Item.from_record(values)
+                item._library = library
+                return item
+            
+            def link_member(member, values):
+                for item_id in values[6:]:
+                    member._borrowed_items[item_id] = library._items[item_id]
+            
+            decode_lock = threading.RLock() if thread_safe else None
+            library._items = LazyRecordMap(snapshot.items, build_item, library._link_item,
+                                           decode_lock)
+            library._members = LazyRecordMap(snapshot.members, Member.from_record, link_member,
+                                             decode_lock)
+            if thread_safe:
+                # Ключи берутся из таблиц снимка без декодирования записей
+                library._item_locks = {item_id: threading.Lock() for item_id in library._items}
+                library._member_locks = {member_id: threading.Lock()
+                                         for member_id in library._members}
+            
+            for index in range(0, counts_len * 3, 3):
+                category, status, count = rest[index:index + 3]
+                library._category_status_counts[category][ItemStatus(status)] = count
+                library._status_counts[ItemStatus(status)] += count
+            loans = rest[counts_len * 3:]
+            for index in range(0, len(loans), 2):
+                library._due_queue.push(loans[index], datetime.fromtimestamp(loans[index + 1]))
+            return library
+        
+        def close(self):
+            """Освободить файлы журнала и снимка и закрыть хранилище элементов"""
+            self._transactions.close()
+            self._items.close()
+            if self._snapshot is not None:
+                self._snapshot.close()
+                self._snapshot = None
+        
+        def __str__(self):
+            stats = self.get_statistics()
+            return (f"Библиотека '{self.name}': {stats['total_items']} элементов, "
+                   f"{stats['total_members']} читателей")
+    
+    class LibraryView:
+        """
+        Согласованное представление библиотеки только для чтения.
+        
+        Видит элементы и читателей в состоянии на момент создания; выдачи
+        и возвраты после этого его не меняют и не ждут его. Элементы и
+        читатели возвращаются отсоединёнными копиями, восстановленными из
+        записей. Поиск идёт по словам из снимка реплики и не берёт
+        блокировку библиотеки: отсортированный список слов строится при
+        первом поиске, дальше префиксы ищутся двоичным поиском.
+        """
+        
+        def __init__(self, items, members, loans, counts, terms, transactions_count):
+            self._items = items
+            self._members = members
+            self._loans = loans
+            self._counts = counts
+            self._terms = terms  # токен -> PersistentMap(item_id -> номер по порядку добавления)
+            self._sorted_terms = None  # Отсортированные токены, строятся при первом поиске
+            self._transactions_count = transactions_count
+            self.created = datetime.now()
+            self._hydrated = {}  # item_id -> восстановленный Item
+        
+        def _item(self, item_id):
+            item = self._hydrated.get(item_id)
+            if item is None:
+                item = self._hydrated[item_id] = Item.from_record(self._items[item_id])
+            return item
+        
+        def get_statistics(self):
+            """Статистика по состоянию на момент создания представления"""
+            by_status, by_category = Counter(), Counter()
+            for (category, status), count in self._counts.items():
+                if count:
+                    by_status[status] += count
+                    by_category[category] += count
+            total_items = len(self._items)
+            available_items = by_status[ItemStatus.AVAILABLE.value]
+            now = datetime.now().timestamp()
             return {
                 'total_items': total_items,
                 'available_items': available_items,
-                'borrowed_items': borrowed_items,
-                'total_members': total_members,
-                'overdue_items': overdue_items,
-                'transactions_count': len(self._transactions)
+                'borrowed_items': total_items - available_items,
+                'total_members': len(self._members),
+                'overdue_items': sum(1 for due in self._loans.values() if due < now),
+                'transactions_count': self._transactions_count,
+                'by_status': dict(by_status),
+                'by_category': dict(by_category)
             }
         
-        def _log_transaction(self, transaction_type: str, description: str):
-            """Записать транзакцию"""
-            transaction = {
-                'timestamp': datetime.now(),
-                'type': transaction_type,
-                'description': description
+        def search_items(self, query: str, category: str = None):
+            """Поиск по префиксам слов, как Library.search_items, среди элементов представления"""
+            tokens = set(InvertedIndex.tokenize(query))
+            if tokens:
+                candidates = InvertedIndex.intersect(
+                    [self._prefix_posting(token) for token in tokens])
+            else:
+                candidates = self._items
+            
+            found = []
+            for item_id in candidates:
+                item = self._item(item_id)
+                if not category or item.get_category() == category:
+                    found.append(item)
+            return found
+        
+        def _prefix_posting(self, prefix):
+            """item_id со словом на prefix в порядке добавления элементов"""
+            if self._sorted_terms is None:
+                self._sorted_terms = sorted(self._terms)
+            start, end = InvertedIndex.prefix_range(self._sorted_terms, prefix)
+            merged = {}
+            for token in self._sorted_terms[start:end]:
+                merged.update(self._terms[token].items())
+            return dict(sorted(merged.items(), key=lambda pair: pair[1]))
+        
+        def get_member_info(self, member_id: str):
+            """Информация о читателе на момент создания представления"""
+            record = self._members.get(member_id)
+            if record is None:
+                raise ValueError(f"Читатель с ID {member_id} не найден")
+            member = Member.from_record(record)
+            member._borrowed_items = {item_id: self._item(item_id) for item_id in record[6:]}
+            return {
+                'member': member,
+                'borrowed_count': member.borrowed_count,
+                'borrowed_items': member.borrowed_items,
+                'fine_amount': member.fine_amount,
+                'can_borrow': member.can_borrow()
             }
-            self._transactions.append(transaction)
+    
+    class AsyncLibrary:
+        """
+        Асинхронный фасад над Library для серверов на asyncio.
+        
+        Вызовы выполняются в пуле потоков и не блокируют цикл событий.
+        Поиски и запросы статистики, пришедшие за один проход цикла,
+        обслуживаются одним заданием пула: все разные поиски отвечаются
+        вместе через Library.search_items_many по одному состоянию
+        индекса, одинаковые запросы получают один и тот же ответ, а
+        статистика считается один раз. Выдача и возврат идут через
+        очередь и применяются строго по порядку. По умолчанию пул из
+        одного потока, поэтому обычная (не потокобезопасная) Library не
+        видит параллельных вызовов.
+        """
+        
+        def __init__(self, library: Library, executor=None, max_batch: int = 256):
+            self._library = library
+            self._own_executor = executor is None
+            self._executor = executor or ThreadPoolExecutor(max_workers=1)
+            self._max_batch = max_batch
+            self._writes = None  # asyncio.Queue, создаётся внутри цикла событий
+            self._writer_task = None
+            self._pending_reads = {}  # ключ запроса -> [future]
+            self._flush_scheduled = False
+        
+        async def borrow_item(self, item_id: str, member_id: str):
+            return await self._submit_write(self._library.borrow_item, item_id, member_id)
+        
+        async def return_item(self, item_id: str):
+            return await self._submit_write(self._library.return_item, item_id)
+        
+        async def search_items(self, query: str, category: str = None):
+            return list(await self._submit_read(('search', query, category)))
+        
+        async def get_statistics(self):
+            return dict(await self._submit_read(('stats',)))
+        
+        async def _submit_write(self, func, *args):
+            """Поставить запись в очередь и дождаться её применения"""
+            loop = asyncio.get_running_loop()
+            if self._writer_task is None:
+                self._writes = asyncio.Queue()
+                self._writer_task = loop.create_task(self._apply_writes())
+            future = loop.create_future()
+            self._writes.put_nowait((func, args, future))
+            return await future
+        
+        async def _apply_writes(self):
+            """Применять записи пачками в порядке поступления"""
+            loop = asyncio.get_running_loop()
+            while True:
+                batch = [await self._writes.get()]
+                while len(batch) < self._max_batch and not self._writes.empty():
+                    batch.append(self._writes.get_nowait())
+                calls = [(func, args) for func, args, _ in batch]
+                outcomes = await loop.run_in_executor(self._executor, self._run_calls, calls)
+                for (_, _, future), (ok, value) in zip(batch, outcomes):
+                    if not future.done():
+                        if ok:
+                            future.set_result(value)
+                        else:
+                            future.set_exception(value)
+                    self._writes.task_done()
+        
+        async def _submit_read(self, key):
+            """Присоединить запрос к пачке чтений текущего прохода цикла"""
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self._pending_reads.setdefault(key, []).append(future)
+            if not self._flush_scheduled:
+                self._flush_scheduled = True
+                loop.call_soon(self._flush_reads)
+            return await future
+        
+        def _flush_reads(self):
+            pending, self._pending_reads = self._pending_reads, {}
+            self._flush_scheduled = False
+            asyncio.get_running_loop().create_task(self._serve_reads(pending))
+        
+        async def _serve_reads(self, pending):
+            """Ответить на все чтения прохода одним заданием пула"""
+            library = self._library
+            searches = [key for key in pending if key[0] == 'search']
+            calls = [(library.search_items_many, ([key[1:] for key in searches],))]
+            if ('stats',) in pending:
+                calls.append((library.get_statistics, ()))
+            loop = asyncio.get_running_loop()
+            outcomes = await loop.run_in_executor(self._executor, self._run_calls, calls)
+            
+            (searches_ok, found), *stats_outcome = outcomes
+            answers = {}  # ключ запроса -> (ok, значение)
+            for index, key in enumerate(searches):
+                answers[key] = (True, found[index]) if searches_ok else (False, found)
+            if stats_outcome:
+                answers[('stats',)] = stats_outcome[0]
+            for key, futures in pending.items():
+                ok, value = answers[key]
+                for future in futures:
+                    if future.done():
+                        continue
+                    if ok:
+                        future.set_result(value)
+                    else:
+                        future.set_exception(value)
+        
+        @staticmethod
+        def _run_calls(calls):
+            """Выполнить вызовы по порядку, собирая результаты и исключения"""
+            outcomes = []
+            for func, args in calls:
+                try:
+                    outcomes.append((True, func(*args)))
+                except Exception as e:
+                    outcomes.append((False, e))
+            return outcomes
+        
+        async def aclose(self):
+            """Дождаться применения записей и остановить обработчик"""
+            if self._writer_task is not None:
+                await self._writes.join()
+                self._writer_task.cancel()
+                try:
+                    await self._writer_task
+                except asyncio.CancelledError:
+                    pass
+                self._writer_task = None
+            if self._own_executor:
+                self._executor.shutdown(wait=True)
+    
+    class LibraryShard:
+        """
+        Шард ShardedLibrary: обычная Library в рабочем процессе.
+        
+        Между процессами передаются только записи снимка (to_record),
+        ID, строки и поля результатов, поэтому классы элементов не нужно сериализовать.
+        """
         
-        def __str__(self):
-            stats = self.get_statistics()
-            return (f"Библиотека '{self.name}': {stats['total_items']} элементов, "
-                   f"{stats['total_members']} читателей")
+        def __init__(self, name: str):
+            self.library = Library(name)
+        
+        def add_item_records(self, records):
+            return self.library.add_items_bulk(records, factory=Item.from_record)
+        
+        def add_member_records(self, records):
+            return self.library.add_members_bulk(records, factory=Member.from_record)
+        
+        def borrow(self, item_id, member_id):
+            """Поля результата выдачи; сообщение формирует вызывающий процесс"""
+            return self.library.borrow_item(item_id, member_id).fields
+        
+        def return_(self, item_id):
+            """Вернуть элемент; штраф передаётся владельцу и в шарде не копится"""
+            item = self.library._items.get(item_id)
+            member = item._borrowed_by if item is not None else None
+            fields = self.library.return_item(item_id).fields  # ValueError, как у Library
+            fine, member._fine_amount = member._fine_amount, 0.0
+            return fields, fine
+        
+        def search(self, query, category):
+            items = self.library.search_items(query, category)
+            return sorted(((item.item_id, item.to_record()) for item in items),
+                          key=lambda pair: pair[0])
+        
+        def overdue(self):
+            return sorted(((item.item_id, item.to_record())
+                           for item in self.library.get_overdue_items()),
+                          key=lambda pair: pair[0])
+        
+        def statistics(self):
+            return self.library.get_statistics()
+    
+    class InlineExecutor:
+        """Исполнитель в текущем процессе, если fork недоступен"""
+        
+        def __init__(self, factory):
+            self._shard = factory()
+        
+        def submit(self, func, method, *args):
+            future = Future()
+            try:
+                future.set_result(getattr(self._shard, method)(*args))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+        
+        def shutdown(self, wait=True):
+            pass
+    
+    class ShardedLibrary:
+        """
+        Библиотека, разделённая по процессам по хешу item_id.
+        
+        Каждый шард — отдельный ProcessPoolExecutor из одного процесса,
+        поэтому операция с элементом всегда попадает в процесс-владелец.
+        Поиск рассылается всем шардам, результаты сливаются по item_id.
+        Читатели копируются во все шарды, а лимит выдачи и штрафы
+        учитываются здесь, в координаторе. Элементы в результатах поиска —
+        отсоединённые копии, восстановленные из записей.
+        """
+        
+        def __init__(self, name: str, shard_count: int = 4):
+            self.name = name
+            self._members = {}  # member_id -> Member (координатор)
+            self._loans = defaultdict(set)  # member_id -> item_id выданных элементов
+            self._borrowers = {}  # item_id -> member_id
+            try:
+                context = multiprocessing.get_context("fork")
+            except ValueError:
+                context = None
+            self._shards = []
+            for index in range(shard_count):
+                factory = functools.partial(LibraryShard, f"{name} #{index}")
+                if context is None:
+                    self._shards.append(InlineExecutor(factory))
+                else:
+                    self._shards.append(ProcessPoolExecutor(
+                        max_workers=1, mp_context=context,
+                        initializer=_init_library_shard, initargs=(factory,)))
+        
+        def _shard_index(self, item_id: str):
+            return zlib.crc32(item_id.encode("utf-8")) % len(self._shards)
+        
+        def _call(self, shard_index, method, *args):
+            return self._shards[shard_index].submit(_call_library_shard, method, *args).result()
+        
+        def _broadcast(self, method, *args):
+            futures = [shard.submit(_call_library_shard, method, *args) for shard in self._shards]
+            return [future.result() for future in futures]
+        
+        def add_item(self, item: Item):
+            self._call(self._shard_index(item.item_id), "add_item_records", [item.to_record()])
+            return ResultMessage("Элемент добавлен: {item}", item=item)
+        
+        def add_items_bulk(self, items, batch_size: int = 10000):
+            """Разослать элементы по шардам пачками; возвращает количество"""
+            added = 0
+            pending = []
+            batches = [[] for _ in self._shards]
+            for item in items:
+                shard_index = self._shard_index(item.item_id)
+                batch = batches[shard_index]
+                batch.append(item.to_record())
+                if len(batch) >= batch_size:
+                    pending.append(self._shards[shard_index].submit(
+                        _call_library_shard, "add_item_records", batch))
+                    batches[shard_index] = []
+            for shard, batch in zip(self._shards, batches):
+                if batch:
+                    pending.append(shard.submit(_call_library_shard, "add_item_records", batch))
+            for future in pending:
+                added += future.result()
+            return added
+        
+        def add_member(self, member: Member):
+            if member.member_id in self._members:
+                raise ValueError(f"Читатель с ID {member.member_id} уже существует")
+            self._broadcast("add_member_records", [member.to_record()])
+            self._members[member.member_id] = member
+            return ResultMessage("Читатель зарегистрирован: {member}", member=member)
+        
+        def borrow_item(self, item_id: str, member_id: str, max_items: int = 5):
+            member = self._members.get(member_id)
+            if not member:
+                raise ValueError(f"Читатель с ID {member_id} не найден")
+            if len(self._loans[member_id]) >= max_items or member.fine_amount > 0:
+                raise ValueError(f"Читатель {member.name} не может взять книги (превышен лимит или есть штрафы)")
+            fields = self._call(self._shard_index(item_id), "borrow", item_id, member_id)
+            self._loans[member_id].add(item_id)
+            self._borrowers[item_id] = member_id
+            return ResultMessage(Item._BORROW_MESSAGE, **fields)
+        
+        def return_item(self, item_id: str):
+            fields, fine = self._call(self._shard_index(item_id), "return_", item_id)
+            member_id = self._borrowers.pop(item_id)
+            self._loans[member_id].discard(item_id)
+            if fine:
+                self._members[member_id].add_fine(fine)
+            return ResultMessage(Item._RETURN_MESSAGE, **fields)
+        
+        def _gather_items(self, method, *args):
+            """Собрать отсортированные ответы шардов в общем порядке item_id"""
+            merged = heapq.merge(*self._broadcast(method, *args), key=lambda pair: pair[0])
+            return [Item.from_record(record) for _, record in merged]
+        
+        def search_items(self, query: str, category: str = None):
+            return self._gather_items("search", query, category)
+        
+        def get_overdue_items(self):
+            return self._gather_items("overdue")
+        
+        def get_statistics(self):
+            """Сумма статистики шардов"""
+            total = Counter()
+            by_status = Counter()
+            by_category = Counter()
+            for stats in self._broadcast("statistics"):
+                by_status.update(stats.pop('by_status'))
+                by_category.update(stats.pop('by_category'))
+                total.update(stats)
+            total['total_members'] = len(self._members)
+            return {**total, 'by_status': dict(by_status), 'by_category': dict(by_category)}
+        
+        def close(self):
+            for shard in self._shards:
+                shard.shutdown(wait=True)
+        
+        def __enter__(self):
+            return self
+        
+        def __exit__(self, exc_type, exc, tb):
+            self.close()
+    
+    class WorkloadGenerator:
+        """
+        Воспроизводимая смесь операций с библиотекой.
+        
+        Популярность элементов подчиняется закону Ципфа: элемент ранга r
+        выбирается с весом 1 / r**zipf_s. Доли операций задаются ratios.
+        Генератор ведёт свою модель выдач по правилам библиотеки, поэтому
+        возвраты относятся к выданным элементам, а отказы в выдаче (элемент
+        уже выдан, у читателя лимит) предсказуемы и одинаковы при каждом
+        запуске с тем же seed.
+        """
+        
+        DEFAULT_RATIOS = {'add': 0.05, 'borrow': 0.25, 'return': 0.2,
+                          'search': 0.45, 'statistics': 0.05}
+        WORDS = ("война", "мир", "тайна", "остров", "сокровища", "путешествие", "звезда",
+                 "город", "море", "история", "приключения", "ночь", "дорога", "сад",
+                 "капитан", "зима", "лето", "река", "тень", "огонь")
+        
+        def __init__(self, item_count: int = 10_000, member_count: int = 500, ratios=None,
+                     zipf_s: float = 1.1, seed: int = 17, max_items: int = 5):
+            ratios = dict(self.DEFAULT_RATIOS if ratios is None else ratios)
+            unknown = set(ratios) - set(self.DEFAULT_RATIOS)
+            if unknown:
+                raise ValueError(f"Неизвестные операции: {sorted(unknown)}")
+            if any(ratio < 0 for ratio in ratios.values()) or not sum(ratios.values()):
+                raise ValueError("Доли операций должны быть неотрицательными и не все нулевыми")
+            
+            self.item_count = item_count
+            self.member_count = member_count
+            self.ratios = ratios
+            self.zipf_s = zipf_s
+            self.seed = seed
+            self.max_items = max_items
+            self._rng = random.Random(seed)
+            self._operations = list(ratios)
+            self._operation_weights = list(itertools.accumulate(ratios.values()))
+            self._zipf_weights = list(itertools.accumulate(
+                1 / rank ** zipf_s for rank in range(1, item_count + 1)))
+            self._ranked = list(range(item_count))  # ранг -> индекс элемента
+            self._rng.shuffle(self._ranked)
+            self._titles = [tuple(self._rng.sample(self.WORDS, 3)) for _ in range(item_count)]
+            self._next_index = item_count
+            self._borrowed = []  # выданные item_id
+            self._borrowed_positions = {}  # item_id -> позиция в _borrowed
+            self._loans = Counter()  # member_id -> число выданных элементов
+        
+        @staticmethod
+        def item_id(index: int):
+            return f"W{index:07d}"
+        
+        def _make_item(self, index: int, words):
+            return Book(self.item_id(index), " ".join(words), f"Автор {index % 997}",
+                        "Изд", 2000, "", 100)
+        
+        def catalogue(self):
+            """Элементы начального каталога"""
+            for index, words in enumerate(self._titles):
+                yield self._make_item(index, words)
+        
+        def members(self):
+            """Читатели нагрузки"""
+            for index in range(self.member_count):
+                yield Member(f"WM{index:05d}", f"Читатель {index}", f"w{index}@example.com", "")
+        
+        def _popular_index(self):
+            """Индекс элемента начального каталога по распределению Ципфа"""
+            roll = self._rng.random() * self._zipf_weights[-1]
+            return self._ranked[bisect.bisect_left(self._zipf_weights, roll)]
+        
+        def _borrow(self):
+            item_id = self.item_id(self._popular_index())
+            member_id = f"WM{self._rng.randrange(self.member_count):05d}"
+            if item_id not in self._borrowed_positions and self._loans[member_id] < self.max_items:
+                self._borrowed_positions[item_id] = len(self._borrowed)
+                self._borrowed.append((item_id, member_id))
+                self._loans[member_id] += 1
+            return 'borrow', (item_id, member_id)
+        
+        def _return(self):
+            position = self._rng.randrange(len(self._borrowed))
+            item_id, member_id = self._borrowed[position]
+            # Удаление обменом с последним — O(1)
+            last = self._borrowed.pop()
+            if position < len(self._borrowed):
+                self._borrowed[position] = last
+                self._borrowed_positions[last[0]] = position
+            del self._borrowed_positions[item_id]
+            self._loans[member_id] -= 1
+            return 'return', (item_id,)
+        
+        def operations(self, count: int):
+            """Последовательность (операция, аргументы) длиной count"""
+            rng = self._rng
+            for _ in range(count):
+                roll = rng.random() * self._operation_weights[-1]
+                operation = self._operations[bisect.bisect_right(self._operation_weights, roll)]
+                if operation == 'return' and not self._borrowed:
+                    operation = 'borrow'
+                
+                if operation == 'borrow':
+                    yield self._borrow()
+                elif operation == 'return':
+                    yield self._return()
+                elif operation == 'add':
+                    index = self._next_index
+                    self._next_index += 1
+                    yield 'add', (self._make_item(index, rng.sample(self.WORDS, 3)),)
+                elif operation == 'search':
+                    yield 'search', (rng.choice(self._titles[self._popular_index()]),)
+                else:
+                    yield 'statistics', ()
+    
+    def run_workload_benchmark(operations=20_000, item_count=10_000, member_count=500,
+                               ratios=None, zipf_s=1.1, seed=17, path=None, store_factory=None):
+        """
+        Задержки операций Library под смешанной нагрузкой WorkloadGenerator.
+        
+        Первый проход измеряет задержку каждой операции (p50, p99, p999 в
+        мкс), второй повторяет ту же нагрузку под tracemalloc и измеряет
+        пиковую память — трассировка замедляет выделения и исказила бы
+        задержки. Результат сохраняется в JSON по пути path, чтобы сравнивать
+        прогоны между коммитами. store_factory создаёт хранилище элементов
+        для каждого прохода (по умолчанию — словарь в памяти).
+        """
+        calls = {
+            'add': Library.add_item,
+            'borrow': Library.borrow_item,
+            'return': Library.return_item,
+            'search': Library.search_items,
+            'statistics': Library.get_statistics,
+        }
+        
+        def prepare():
+            generator = WorkloadGenerator(item_count, member_count, ratios, zipf_s, seed)
+            bench_library = Library("Нагрузка",
+                                    item_store=store_factory() if store_factory else None)
+            bench_library.add_items_bulk(generator.catalogue())
+            bench_library.add_members_bulk(generator.members())
+            return generator, bench_library
+        
+        generator, bench_library = prepare()
+        latencies = defaultdict(list)
+        rejected = Counter()
+        clock = time.perf_counter_ns
+        for operation, args in generator.operations(operations):
+            call = calls[operation]
+            started = clock()
+            try:
+                call(bench_library, *args)
+            except ValueError:
+                rejected[operation] += 1
+            latencies[operation].append(clock() - started)
+        bench_library.verify_statistics()
+        
+        tracemalloc.start()
+        generator, bench_library = prepare()
+        for operation, args in generator.operations(operations):
+            try:
+                calls[operation](bench_library, *args)
+            except ValueError:
+                pass
+        peak_memory = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        
+        def percentile(ordered, quantile):
+            return ordered[min(len(ordered) - 1, int(quantile * len(ordered)))] / 1000
+        
+        results = {
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'python': sys.version.split()[0],
+            'seed': seed,
+            'operations': operations,
+            'item_count': item_count,
+            'member_count': member_count,
+            'zipf_s': zipf_s,
+            'ratios': generator.ratios,
+            'latency_us': {},
+            'peak_memory_bytes': peak_memory,
+        }
+        for operation in calls:
+            samples = sorted(latencies.get(operation, ()))
+            if not samples:
+                continue
+            results['latency_us'][operation] = {
+                'count': len(samples),
+                'rejected': rejected[operation],
+                'p50': percentile(samples, 0.5),
+                'p99': percentile(samples, 0.99),
+                'p999': percentile(samples, 0.999),
+            }
+            stats = results['latency_us'][operation]
+            print(f"  {operation:<10} {stats['count']:>6} оп. (отказов {stats['rejected']:>4})  "
+                  f"p50 {stats['p50']:>8.1f}  p99 {stats['p99']:>8.1f}  p999 {stats['p999']:>8.1f} мкс")
+        print(f"  Пиковая память: {peak_memory / 2**20:.1f} МиБ")
+        
+        if path is not None:
+            with open(path, 'w', encoding='utf-8') as results_file:
+                json.dump(results, results_file, ensure_ascii=False, indent=2)
+        return results
+    
+    def run_autocomplete_benchmark(catalogue_size=50_000, queries=200, seed=5):
+        """Средняя задержка autocomplete на синтетическом каталоге, мкс"""
+        rng = random.Random(seed)
+        words = ["война", "мир", "тайна", "остров", "сокровища", "путешествие", "звезда",
+                 "город", "море", "история", "приключения", "ночь", "дорога", "сад"]
+        bench_library = Library("Подсказки")
+        bench_library.add_items_bulk(
+            Book(f"AC{i:06d}", " ".join(rng.sample(words, 3)) + f" {i}",
+                 f"Автор{rng.randrange(2000)}", "Изд", 2000, "", 100)
+            for i in range(catalogue_size))
+        bench_library.search_items("мир")
+        
+        prefixes = [rng.choice(words)[:rng.randint(2, 5)] for _ in range(queries)]
+        typos = [word[:2] + word[3:] for word in (rng.choice(words) for _ in range(queries))]
+        for label, batch in (("префикс", prefixes), ("опечатка", typos)):
+            started = time.perf_counter()
+            for query in batch:
+                bench_library.autocomplete(query, k=10)
+            latency_us = (time.perf_counter() - started) * 1e6 / len(batch)
+            print(f"  {label:<9} {latency_us:8.1f} мкс на запрос ({catalogue_size} элементов)")
+    
+    def run_memory_benchmark(count=100_000, publishers=20):
+        """
+        Память на один элемент: __dict__ против __slots__ и flyweight издателей.
+        
+        Вариант с __dict__ — копии Item и Book без __slots__ с теми же
+        методами; экземпляр получает значения слотов настоящей Book. Строки
+        названий общие для всех вариантов, строки издателей создаются заново
+        для каждого элемента, как при чтении из файла.
+        """
+        title = "Синтетическая книга"
+        
+        def unslotted(cls, bases):
+            """Копия класса без __slots__: атрибуты экземпляра лежат в __dict__"""
+            namespace = {name: value for name, value in vars(cls).items()
+                         if name not in cls.__slots__ and name != '__slots__'}
+            return type(cls)(cls.__name__, bases, namespace)
+        
+        DictBook = unslotted(Book, (unslotted(Item, Item.__bases__),))
+        slot_names = Item.__slots__ + Book.__slots__
+        
+        def slotted_book(i):
+            return Book(f"K{i:07d}", title, "Автор", f"Издательство {i % publishers}",
+                        2000, "", 100)
+        
+        def dict_book(i):
+            # __init__ копии не вызывается: super() в методах привязан к исходным классам
+            source = slotted_book(i)
+            book = object.__new__(DictBook)
+            for name in slot_names:
+                setattr(book, name, getattr(source, name))
+            return book
+        
+        def measure(factory):
+            tracemalloc.start()
+            before = tracemalloc.get_traced_memory()[0]
+            objects = [factory(i) for i in range(count)]
+            used = tracemalloc.get_traced_memory()[0] - before
+            tracemalloc.stop()
+            del objects
+            return used / count
+        
+        Item.intern_publishers = False
+        try:
+            results = {'__dict__': measure(dict_book), '__slots__': measure(slotted_book)}
+        finally:
+            Item.intern_publishers = True
+        results['__slots__ + flyweight'] = measure(slotted_book)
+        
+        for variant, per_item in results.items():
+            print(f"  {variant:<22} {per_item:7.1f} байт на элемент")
+        return results
+    
+    def run_sharding_benchmark(catalogue_size=1_000_000, shard_counts=(1, 2, 4), queries=50,
+                               seed=11):
+        """
+        Задержка поиска ShardedLibrary в зависимости от числа шардов.
+        
+        Каталог синтетический: названия из 1000 серий, 500 авторов.
+        Возвращает словарь число шардов -> средняя задержка в миллисекундах.
+        """
+        rng = random.Random(seed)
+        query_list = [rng.choice((f"серия {rng.randrange(1000)}", f"автор {rng.randrange(500)}"))
+                      for _ in range(queries)]
+        results = {}
+        for shard_count in shard_counts:
+            with ShardedLibrary("Шардированная", shard_count) as sharded:
+                started = time.perf_counter()
+                sharded.add_items_bulk(
+                    Book(f"X{i:07d}", f"Серия {i % 1000} выпуск {i}", f"Автор {i % 500}",
+                         "Изд", 2000, "", 100) for i in range(catalogue_size))
+                load_time = time.perf_counter() - started
+                
+                started = time.perf_counter()
+                found = sum(len(sharded.search_items(query)) for query in query_list)
+                latency_ms = (time.perf_counter() - started) * 1000 / queries
+            results[shard_count] = latency_ms
+            print(f"  Шардов: {shard_count}, загрузка {catalogue_size} элементов: {load_time:.2f} с, "
+                  f"поиск: {latency_ms:.2f} мс/запрос (найдено {found})")
+        return results
+    
+    def run_async_benchmark(clients=1000, requests_per_client=5, items_count=2000, seed=7):
+        """
+        Пропускная способность AsyncLibrary при множестве одновременных клиентов.
+        
+        Каждый клиент выполняет смесь запросов: 70% поиск, 10% статистика,
+        20% выдача с последующим возвратом. Возвращает запросы в секунду.
+        """
+        async_library = Library("Асинхронная")
+        async_library.add_items_bulk(
+            Book(f"A{i:05d}", f"Сборник {i % 200} том {i}", f"Автор {i % 50}", "Изд",
+                 2000, "", 100) for i in range(items_count))
+        async_library.add_members_bulk(
+            Member(f"C{i:04d}", f"Клиент {i}", f"c{i}@example.com", "") for i in range(clients))
+        
+        async def client(facade, index, counters):
+            rng = random.Random(seed + index)
+            for _ in range(requests_per_client):
+                roll = rng.random()
+                if roll < 0.7:
+                    await facade.search_items(f"сборник {rng.randrange(200)}")
+                elif roll < 0.8:
+                    await facade.get_statistics()
+                else:
+                    item_id = f"A{rng.randrange(items_count):05d}"
+                    try:
+                        await facade.borrow_item(item_id, f"C{index:04d}")
+                        await facade.return_item(item_id)
+                        counters['requests'] += 1
+                    except ValueError:
+                        counters['conflicts'] += 1
+                counters['requests'] += 1
+        
+        async def main():
+            facade = AsyncLibrary(async_library)
+            counters = Counter()
+            started = time.perf_counter()
+            await asyncio.gather(*(client(facade, i, counters) for i in range(clients)))
+            elapsed = time.perf_counter() - started
+            await facade.aclose()
+            return counters, elapsed
+        
+        counters, elapsed = asyncio.run(main())
+        async_library.verify_statistics()
+        rps = counters['requests'] / elapsed if elapsed else 0.0
+        print(f"  Клиентов: {clients}, запросов: {counters['requests']}, "
+              f"конфликтов: {counters['conflicts']}, {rps:,.0f} запросов/с")
+        return rps
+    
+    def run_concurrency_benchmark(thread_counts=(1, 2, 4, 8), operations_per_thread=2000,
+                                  items_count=64, seed=42):
+        """
+        Нагрузочный тест потокобезопасной библиотеки.
+        
+        Потоки выдают и сразу возвращают случайные элементы из общего пула,
+        конфликтуя за одни и те же элементы. Для каждого числа потоков
+        печатается пропускная способность, после прогона проверяются
+        инварианты библиотеки.
+        """
+        results = {}
+        for thread_count in thread_counts:
+            bench_library = Library("Нагрузка", thread_safe=True)
+            bench_library.add_items_bulk(
+                Book(f"S{i:05d}", f"Книга {i}", "Автор", "Изд", 2000, "", 100)
+                for i in range(items_count))
+            bench_library.add_members_bulk(
+                Member(f"T{i:03d}", f"Поток {i}", f"t{i}@example.com", "")
+                for i in range(thread_count))
+            
+            completed = [0] * thread_count
+            conflicts = [0] * thread_count
+            start_barrier = threading.Barrier(thread_count + 1)
+            
+            def worker(index):
+                rng = random.Random(seed + index)
+                member_id = f"T{index:03d}"
+                start_barrier.wait()
+                for _ in range(operations_per_thread):
+                    item_id = f"S{rng.randrange(items_count):05d}"
+                    try:
+                        bench_library.borrow_item(item_id, member_id)
+                    except ValueError:
+                        conflicts[index] += 1
+                        continue
+                    bench_library.return_item(item_id)
+                    completed[index] += 2
+            
+            threads = [threading.Thread(target=worker, args=(i,)) for i in range(thread_count)]
+            for thread in threads:
+                thread.start()
+            start_barrier.wait()
+            started = time.perf_counter()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - started
+            
+            stats = bench_library.get_statistics()
+            bench_library.verify_statistics(stats)
+            if stats['borrowed_items'] != 0:
+                raise RuntimeError("После нагрузочного теста остались выданные элементы")
+            
+            results[thread_count] = {
+                'operations': sum(completed),
+                'conflicts': sum(conflicts),
+                'ops_per_second': sum(completed) / elapsed if elapsed else 0.0
+            }
+            print(f"  Потоков: {thread_count:>2}, операций: {sum(completed):>6}, "
+                  f"конфликтов: {sum(conflicts):>5}, "
+                  f"{results[thread_count]['ops_per_second']:,.0f} оп/с")
+        return results
     
     # Тестирование системы библиотеки
     print("1. Создание библиотеки и добавление элементов:")
     
-    library = Library("Центральная библиотека")
+    library = Library("Центральная библиотека", check_consistency=True)
     
     # Добавляем книги
     book1 = Book("B001", "1984", "Джордж Оруэлл", "Прогресс", 1949, "978-0-452-28423-4", 328)
@@ -474,6 +3956,7 @@ def exercise_01_library_management_system():
         info = library.get_member_info(member_id)
         print(f"\nЧитатель: {info['member'].name}")
         print(f"  Взято книг: {info['borrowed_count']}")
+        print(f"  Элементы: {[item.title for item in info['borrowed_items']]}")
         print(f"  Штрафы: {info['fine_amount']}")
         print(f"  Может брать книги: {info['can_borrow']}")
     
@@ -484,6 +3967,15 @@ def exercise_01_library_management_system():
     for item in search_results:
         print(f"  {item}")
     
+    book2.title = "Мастер и Маргарита (иллюстрированное издание)"
+    print(f"Поиск 'иллюстрированное' после смены названия: "
+          f"{library.search_items('иллюстрированное')}")
+    print(f"Поиск 'булгаков' среди книг: {library.search_items('булгаков', category='Книга')}")
+    print(f"Поиск 'булгаков' среди DVD: {library.search_items('булгаков', category='DVD')}")
+    
+    for query in ["мас", "матрца", "оруел", "мастер и мар"]:
+        print(f"Подсказки '{query}': {[item.title for item in library.autocomplete(query, k=3, budget_ms=20)]}")
+    
     print("\n6. Возврат книг:")
     
     print(library.return_item("B001"))
@@ -496,11 +3988,285 @@ def exercise_01_library_management_system():
     print(f"Доступно элементов: {stats['available_items']}")
     print(f"Выдано элементов: {stats['borrowed_items']}")
     print(f"Просроченных: {stats['overdue_items']}")
+    print(f"По категориям: {stats['by_category']}")
+    
+    print("\n8. Просроченные элементы:")
+    
+    # Выдача задним числом: срок возврата истёк два дня назад
+    print(magazine1.borrow(member2, days=-2))
+    member2.add_borrowed_item(magazine1)
+    print(f"Просроченные: {library.get_overdue_items()}")
+    print(library.return_item("M001"))
+    print(f"Штраф читателя {member2.name}: {member2.fine_amount}")
+    print(f"Просроченные после возврата: {library.get_overdue_items()}")
+    print(f"Счётчики сходятся со сканированием: {library.verify_statistics()}")
+    
+    print("\n9. Журнал операций:")
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        archived = library.archive_transactions(os.path.join(tmp_dir, "transactions.log"))
+        print(f"Выгружено записей в файл: {archived}")
+        library.return_item("D001")
+        since = datetime.now() - timedelta(minutes=5)
+        for record, description in library.get_transactions(start=since)[-4:]:
+            print(f"  {record.timestamp:%H:%M:%S} {record.type:<10} {description}")
+        print(f"Последняя запись: {library._transactions[-1]}")
+        library._transactions.close()
+    
+    print("\n10. Агрегаты операций:")
+    
+    history = Library("Архив", transaction_retention=timedelta(days=1))
+    week_ago = datetime.now() - timedelta(days=7)
+    rng = random.Random(15)
+    for minute in range(0, 7 * 24 * 60, 5):
+        moment = week_ago + timedelta(minutes=minute)
+        history._transactions.append(rng.choice(("BORROW", "BORROW", "RETURN", "FINE")),
+                                     "B001", "M001", 1.5, timestamp=moment)
+    now = datetime.now()
+    for hour_start, borrows in history.transaction_series(
+            now - timedelta(hours=3), now, 'hour', "BORROW"):
+        print(f"  {hour_start:%d.%m %H:%M} выдач: {borrows}")
+    totals = history.transaction_totals(week_ago, now)
+    print(f"Выдач за неделю: {totals['BORROW']['count']}, "
+          f"штрафов на {totals['FINE']['amount']:.1f}")
+    print(f"Записей в журнале: {len(history._transactions)}, "
+          f"удалено по сроку: {history._transactions.evicted}")
+    
+    print("\n11. Массовая загрузка:")
+    
+    catalogue_csv = io.StringIO(
+        "B100,Война и мир,Лев Толстой,Эксмо,1869,978-5-04-000001-1,1300\n"
+        "B101,Анна Каренина,Лев Толстой,Эксмо,1878,978-5-04-000002-8,864\n"
+        "B102,Идиот,Фёдор Достоевский,АСТ,1869,978-5-17-000003-5,640\n"
+    )
+    bulk_library = Library("Филиал", check_consistency=True)
+    added = bulk_library.add_items_bulk(
+        csv.reader(catalogue_csv),
+        factory=lambda row: Book(row[0], row[1], row[2], row[3], int(row[4]), row[5], int(row[6])),
+        batch_size=2)
+    print(f"Загружено элементов из CSV: {added}")
+    added = bulk_library.add_members_bulk(
+        Member(f"R{i:03d}", f"Читатель {i}", f"reader{i}@example.com", "") for i in range(50))
+    print(f"Зарегистрировано читателей: {added}")
+    try:
+        bulk_library.add_items_bulk([Book("B100", "Дубликат", "Автор", "Изд", 2000, "", 1)])
+    except ValueError as e:
+        print(f"Ошибка пачки: {e}")
+    print(f"Поиск 'толстой': {bulk_library.search_items('толстой')}")
+    print(f"Журнал: {[entry['description'] for entry in bulk_library._transactions]}")
+    
+    print("\n12. Пакетные штрафы:")
+    
+    bulk_library.set_fine_policy(tiers=((1, 1.0), (8, 2.0), (31, 5.0)),
+                                 category_rates={'DVD': 3.0})
+    for item_id, member_id, days_late in [("B100", "R000", 10), ("B101", "R001", 40),
+                                          ("B102", "R000", 3)]:
+        item = bulk_library._items[item_id]
+        member = bulk_library._members[member_id]
+        item.borrow(member, days=-days_late)  # Выдача задним числом
+        member.add_borrowed_item(item)
+    print(f"Закрытие дня: {bulk_library.charge_overdue_fines()}")
+    print(f"Повторное закрытие дня: {bulk_library.charge_overdue_fines()}")
+    print(f"Пакетный возврат: {bulk_library.return_items_bulk(['B100', 'B101', 'B102'])}")
+    print(f"Штрафы: R000 = {bulk_library._members['R000'].fine_amount}, "
+          f"R001 = {bulk_library._members['R001'].fine_amount}")
+    bulk_library.verify_statistics()
+    
+    print("\n13. Резервирование:")
+    
+    member3 = Member("M003", "Вика Смирнова", "vika@example.com", "+7-900-555-0000")
+    member4 = Member("M004", "Гена Орлов", "gena@example.com", "+7-900-555-1111")
+    library.add_member(member3)
+    library.add_member(member4)
+    library.subscribe_holds(lambda item, member: print(f"  [уведомление] {item.title} ждёт {member.name}"))
+    print(library.borrow_item("D001", "M001"))
+    for member_id in ("M002", "M003", "M004"):
+        position = library.reserve_item("D001", member_id)
+        print(f"Резерв {member_id} на D001: позиция {position}")
+    library.cancel_reservation("D001", "M003")
+    print(f"Позиция M004 после отмены M003: {library.queue_position('D001', 'M004')}")
+    print(library.return_item("D001"))
+    print(f"Статус D001: {dvd1.status.value}, позиция M002: {library.queue_position('D001', 'M002')}")
+    try:
+        library.borrow_item("D001", "M004")
+    except ValueError as e:
+        print(f"Ошибка: {e}")
+    print(member2.pay_fine(member2.fine_amount))
+    print(library.borrow_item("D001", "M002"))
+    print(library.return_item("D001"))
+    print(library.borrow_item("D001", "M004"))
+    print(library.return_item("D001"))
+    
+    print("\n14. Снимок состояния:")
+    
+    library.borrow_item("B002", "M001")
+    print(book1.borrow(member4, days=-3))  # Выдача задним числом
+    member4.add_borrowed_item(book1)
+    print(f"Закрытие дня до снимка: {library.charge_overdue_fines()}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        snapshot_path = os.path.join(tmp_dir, "library.snap")
+        library.save_snapshot(snapshot_path)
+        print(f"Размер снимка: {os.path.getsize(snapshot_path)} байт")
+        
+        restored = Library.load_snapshot(snapshot_path, check_consistency=True)
+        print(f"Элементов в снимке: {len(restored._items)}, "
+              f"декодировано: {restored._items.loaded_count}")
+        restored_book = restored._items["B002"]
+        print(f"{restored_book!r} выдан {restored_book._borrowed_by.name}, "
+              f"декодировано: {restored._items.loaded_count}")
+        print(restored.return_item("B002"))
+        print(f"Поиск 'матрица': {restored.search_items('матрица')}")
+        # Выставленные до снимка дни не начисляются повторно
+        charged_again = restored.charge_overdue_fines()
+        print(f"Закрытие дня после загрузки: {charged_again}")
+        if charged_again or restored._fine_engine.tiers != library._fine_engine.tiers:
+            raise RuntimeError("Снимок не сохранил выставленные штрафы или политику штрафов")
+        print(f"Восстановлено: {restored}")
+        restored.close()
+    library.return_item("B002")
+    print(library.return_item("B001"))
+    print(f"Штраф {member4.name}: {member4.fine_amount}")
+    member4.pay_fine(member4.fine_amount)
+    
+    print("\n15. Представление для отчётов:")
+    
+    report = library.read_view()
+    print(library.borrow_item("B002", "M003"))
+    print(f"Выдано в представлении: {report.get_statistics()['borrowed_items']}, "
+          f"в библиотеке: {library.get_statistics()['borrowed_items']}")
+    print(f"Элементы M003 в представлении: {list(report.get_member_info('M003')['borrowed_items'])}")
+    print(f"Поиск 'матрица' в представлении: {report.search_items('матрица')}")
+    library.return_item("B002")
+    print(f"Новое представление, выдано: {library.read_view().get_statistics()['borrowed_items']}")
+    
+    print("\n16. Многопоточная выдача и возврат:")
+    
+    run_concurrency_benchmark(thread_counts=(1, 2), operations_per_thread=100)
+    
+    print("\n17. Асинхронный фасад:")
+    
+    run_async_benchmark(clients=50, requests_per_client=5, items_count=200)
+    
+    print("\n18. Шардирование по процессам:")
+    
+    with ShardedLibrary("Сеть филиалов", shard_count=3) as sharded:
+        print(f"Загружено: {sharded.add_items_bulk([book1, book2, magazine1, dvd1])}")
+        print(sharded.add_member(Member("S001", "Вера Соколова", "vera@example.com", "")))
+        print(sharded.borrow_item("D001", "S001"))
+        print(f"Поиск 'матрица': {sharded.search_items('матрица')}")
+        print(sharded.return_item("D001"))
+        stats = sharded.get_statistics()
+        print(f"Статистика шардов: {stats['total_items']} элементов, "
+              f"{stats['available_items']} доступно, по категориям {stats['by_category']}")
+    
+    print("\n19. Скорость подсказок:")
+    
+    run_autocomplete_benchmark(catalogue_size=2000, queries=50)
+    
+    print("\n20. Память элементов:")
+    
+    run_memory_benchmark(count=5000)
+    
+    print("\n21. Профиль нагрузки:")
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        results_path = os.path.join(tmp_dir, "workload.json")
+        run_workload_benchmark(operations=1000, item_count=500, member_count=50, path=results_path)
+        with open(results_path, encoding='utf-8') as results_file:
+            saved = json.load(results_file)
+        print(f"Результаты сохранены: {sorted(saved['latency_us'])}")
+    
+    print("\n22. Хранилище SQLite:")
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "items.db")
+        store = SQLiteItemStore(db_path, cache_size=100)
+        stored = Library("Хранилище", check_consistency=True, item_store=store)
+        stored.add_items_bulk(
+            Book(f"SQ{i:06d}", f"Том {i}", f"Автор {i % 100}", "Изд", 2000, "", 100)
+            for i in range(500))
+        stored.add_member(Member("Q001", "Зоя Ким", "zoya@example.com", ""))
+        print(stored.borrow_item("SQ000042", "Q001"))
+        print(f"Поиск 'том 123': {stored.search_items('том 123')}")
+        print(f"В кэше: {len(store._cache)}, закреплено: {len(store._pinned)}, "
+              f"чтений из таблицы: {store.misses}")
+        print(stored.return_item("SQ000042"))
+        print(f"По индексу названий: {store.find_title('Том 499')}")
+        stored.borrow_item("SQ000007", "Q001")
+        print(stored)
+        stored.close()
+        
+        # Повторное открытие: счётчики и сроки выдач берутся из таблицы,
+        # check_consistency сверяет их с запросами к ней; читатели
+        # восстанавливаются, и выданный элемент снова можно вернуть
+        reopened = Library("Хранилище", check_consistency=True,
+                           item_store=SQLiteItemStore(db_path, cache_size=100))
+        stats = reopened.get_statistics()
+        print(f"После повторного открытия: {stats['available_items']} доступно, "
+              f"{stats['borrowed_items']} выдано из {stats['total_items']}, "
+              f"{stats['total_members']} читателей")
+        print(f"Поиск 'том 77' после открытия: {reopened.search_items('том 77')}")
+        print(reopened.return_item("SQ000007"))
+        reopened.close()
+    
+    print("\n23. Отложенные сообщения:")
+    
+    result = library.borrow_item("B001", "M003")
+    print(f"Поля: {result.item_id}, {result.member_name}, срок {result.due_date:%d.%m}")
+    print(f"Как строка: {result.startswith('Элемент')}, {result == str(result)}, {len(result)} символов")
+    print(library.return_item("B001"))
+    
+    print("\n24. Поток событий:")
+    
+    watcher = library.subscribe_events(capacity=64, event_types=(ItemBorrowed, ItemReturned))
+    recent = library.subscribe_events(capacity=2, policy='drop_newest')
+    availability = {}
+    library.borrow_item("B001", "M003")
+    library.return_item("B001")
+    library.add_member(Member("M005", "Даша Лис", "dasha@example.com", ""))
+    for event in watcher.poll():
+        status = event.status if isinstance(event, ItemReturned) else ItemStatus.BORROWED.value
+        availability[event.item_id] = status
+        print(f"  #{event.seq} {type(event).__name__}: {event.item_id} -> {status}")
+    print(f"Доступность по событиям: {availability}")
+    print(f"Кольцо на 2 события: {[type(event).__name__ for event in recent.poll()]}, "
+          f"отброшено: {recent.dropped}")
+    watcher.close()
+    recent.close()
+    
+    blocking = library.subscribe_events(capacity=1, policy='block', event_types=(ItemAdded,),
+                                        block_timeout=1.0)
+    received = []
+    consumer = threading.Thread(target=lambda: received.extend(blocking.get(timeout=1.0)
+                                                                for _ in range(3)))
+    consumer.start()
+    library.add_items_bulk(Magazine(f"EV{i}", f"Вестник {i}", "Изд", 2024, i, "Май")
+                           for i in range(3))
+    consumer.join()
+    blocking.close()
+    print(f"Политика block: получено {[event.item_id for event in received]}, "
+          f"отброшено: {blocking.dropped}")
+    
+    if run_benchmarks:
+        print("\n25. Замеры производительности:")
+        
+        print("Потоки:")
+        run_concurrency_benchmark(thread_counts=(1, 2, 4, 8), operations_per_thread=500)
+        print("Асинхронный фасад:")
+        run_async_benchmark(clients=1000, requests_per_client=5)
+        print("Шарды:")
+        run_sharding_benchmark(catalogue_size=20000, shard_counts=(1, 2, 4), queries=20)
+        print("Подсказки:")
+        run_autocomplete_benchmark(catalogue_size=20_000)
+        print("Память:")
+        run_memory_benchmark(count=50_000)
+        print("Профиль нагрузки:")
+        run_workload_benchmark(operations=20_000, item_count=10_000)
     
     print("\n✅ Упражнение 1 завершено!")
 
 
-def exercise_02_game_development_framework():
+def exercise_02_game_development_framework(run_benchmarks: bool = False):
     """
     Упражнение 2: Фреймворк для разработки игр
     
@@ -512,6 +4278,9 @@ def exercise_02_game_development_framework():
     4. Метаклассы для автоматической регистрации
     5. Специальные методы для сравнения и итерации
     6. Протоколы для различных интерфейсов
+    
+    Демонстрация запускает замеры на небольших сценах; полные замеры
+    производительности выполняются только при run_benchmarks=True.
     """
     print("=== Упражнение 2: Фреймворк для разработки игр ===")
     
@@ -519,12 +4288,13 @@ def exercise_02_game_development_framework():
     
     # РЕШЕНИЕ:
     
-    from typing import Protocol, Set, Type
+    from typing import Protocol, Set, Tuple, Type
+    from abc import ABC, ABCMeta, abstractmethod
     import weakref
     import math
     
     # Метакласс для автоматической регистрации компонентов
-    class ComponentMeta(type):
+    class ComponentMeta(ABCMeta):
         """Метакласс для автоматической регистрации компонентов"""
         
         registry: Dict[str, Type] = {}
@@ -533,7 +4303,7 @@ def exercise_02_game_development_framework():
             cls = super().__new__(mcs, name, bases, namespace)
             
             # Регистрируем только не абстрактные компоненты
-            if not getattr(cls, '__abstract__', False) and name != 'Component':
+            if not namespace.get('__abstract__', False) and name != 'Component':
                 mcs.registry[name.lower()] = cls
                 print(f"Компонент {name} автоматически зарегистрирован")
             
@@ -579,21 +4349,45 @@ def exercise_02_game_development_framework():
     
     # Базовые классы
     class Vector2D:
-        """Двумерный вектор"""
+        """
+        Двумерный вектор.
+        
+        Неизменяемый: x и y только для чтения, операторы возвращают новый
+        вектор, a += b лишь перепривязывает имя, поэтому вектор можно
+        держать ключом словаря и разделять между объектами. add_scaled()
+        считает a + b * k одним новым вектором без промежуточного.
+        Изменять много векторов на месте — в Vector2DArray.
+        """
+        
+        __slots__ = ('_x', '_y')
         
         def __init__(self, x: float = 0, y: float = 0):
-            self.x = x
-            self.y = y
+            self._x = x
+            self._y = y
+        
+        @property
+        def x(self):
+            return self._x
+        
+        @property
+        def y(self):
+            return self._y
         
         def __add__(self, other):
-            if isinstance(other, Vector2D):
+            try:
                 return Vector2D(self.x + other.x, self.y + other.y)
-            return NotImplemented
+            except AttributeError:
+                return NotImplemented
         
         def __sub__(self, other):
-            if isinstance(other, Vector2D):
+            try:
                 return Vector2D(self.x - other.x, self.y - other.y)
-            return NotImplemented
+            except AttributeError:
+                return NotImplemented
+        
+        def add_scaled(self, other, scale: float):
+            """self + other * scale без промежуточного вектора"""
+            return Vector2D(self._x + other.x * scale, self._y + other.y * scale)
         
         def __mul__(self, scalar):
             if isinstance(scalar, (int, float)):
@@ -637,6 +4431,146 @@ def exercise_02_game_development_framework():
         def __hash__(self):
             return hash((round(self.x, 3), round(self.y, 3)))
     
+    class Vector2DArray:
+        """
+        Пакет векторов в массиве NumPy формы (n, 2).
+        
+        Операторы возвращают новый пакет, iadd()/imul() меняют этот.
+        Вторым операндом может быть пакет той же длины, Vector2D или
+        число (для * и /), в том числе массив чисел длины n.
+        """
+        
+        __slots__ = ('data',)
+        
+        def __init__(self, data):
+            self.data = np.asarray(data, dtype=float).reshape(-1, 2)
+        
+        @classmethod
+        def from_vectors(cls, vectors):
+            return cls([(vector.x, vector.y) for vector in vectors])
+        
+        @classmethod
+        def zeros(cls, count: int):
+            return cls(np.zeros((count, 2)))
+        
+        @staticmethod
+        def _operand(other):
+            if isinstance(other, Vector2DArray):
+                return other.data
+            if isinstance(other, Vector2D):
+                return np.array((other.x, other.y))
+            return NotImplemented
+        
+        @staticmethod
+        def _scalar(scalar):
+            scalar = np.asarray(scalar, dtype=float)
+            return scalar[:, None] if scalar.ndim == 1 else scalar
+        
+        def __add__(self, other):
+            operand = self._operand(other)
+            if operand is NotImplemented:
+                return NotImplemented
+            return Vector2DArray(self.data + operand)
+        
+        def __sub__(self, other):
+            operand = self._operand(other)
+            if operand is NotImplemented:
+                return NotImplemented
+            return Vector2DArray(self.data - operand)
+        
+        def __mul__(self, scalar):
+            return Vector2DArray(self.data * self._scalar(scalar))
+        
+        def __rmul__(self, scalar):
+            return self.__mul__(scalar)
+        
+        def __truediv__(self, scalar):
+            return Vector2DArray(self.data / self._scalar(scalar))
+        
+        def iadd(self, other, scale: float = 1.0):
+            """Прибавить other * scale на месте"""
+            operand = self._operand(other)
+            if operand is NotImplemented:
+                raise TypeError(f"Нельзя прибавить {type(other).__name__}")
+            if scale == 1.0:
+                self.data += operand
+            else:
+                self.data += operand * scale
+            return self
+        
+        def imul(self, scalar):
+            """Умножить на число (или по числу на вектор) на месте"""
+            self.data *= self._scalar(scalar)
+            return self
+        
+        def magnitude(self):
+            """Длины всех векторов"""
+            return np.hypot(self.data[:, 0], self.data[:, 1])
+        
+        def normalize(self):
+            """Нормализованные векторы; нулевые остаются нулевыми"""
+            magnitude = self.magnitude()
+            safe = np.where(magnitude > 0, magnitude, 1.0)
+            return Vector2DArray(self.data / safe[:, None])
+        
+        def __len__(self):
+            return len(self.data)
+        
+        def __getitem__(self, index):
+            return Vector2D(*self.data[index].tolist())
+        
+        def __setitem__(self, index, vector):
+            self.data[index] = (vector.x, vector.y)
+        
+        def __iter__(self):
+            return (Vector2D(x, y) for x, y in self.data.tolist())
+        
+        def __repr__(self):
+            return f"Vector2DArray(n={len(self)})"
+    
+    class RowField:
+        """
+        Поле компонента, хранящееся в строке PhysicsWorld.
+        
+        Пока компонент не подключён к миру (_world is None), значение
+        лежит в атрибуте '_<имя>'. После подключения чтение и запись
+        идут в массив мира с тем же именем; векторное поле читается как
+        Vector2D из строки. Vector2D неизменяем, поэтому изменить поле
+        можно только присваиванием (t.position.x += 5 — AttributeError),
+        и запись никогда не теряется в отсоединённой копии.
+        С notify=True после записи вызывается component._on_changed(имя).
+        """
+        
+        def __init__(self, vector: bool = False, notify: bool = False):
+            self.vector = vector
+            self.notify = notify
+        
+        def __set_name__(self, owner, name):
+            self.name = name
+            self.local = '_' + name
+        
+        def __get__(self, component, owner=None):
+            if component is None:
+                return self
+            world = component._world
+            if world is None:
+                return getattr(component, self.local)
+            value = getattr(world, self.name)[component._row]
+            if self.vector:
+                return Vector2D(*value.tolist())
+            return value.item()
+        
+        def __set__(self, component, value):
+            world = component._world
+            if world is None:
+                setattr(component, self.local, value)
+            elif self.vector:
+                getattr(world, self.name)[component._row] = (value.x, value.y)
+            else:
+                getattr(world, self.name)[component._row] = value
+            if self.notify:
+                component._on_changed(self.name)
+    
     class Component(ABC, metaclass=ComponentMeta):
         """Абстрактный базовый класс компонента"""
         
@@ -666,18 +4600,39 @@ def exercise_02_game_development_framework():
     class Transform(Component):
         """Компонент позиции и трансформации"""
         
+        position = RowField(vector=True, notify=True)
+        
         def __init__(self, position: Vector2D = None, rotation: float = 0, scale: Vector2D = None):
+            self._world = None  # PhysicsWorld, если у объекта есть подключённый Rigidbody
+            self._row = None
             super().__init__()
-            self.position = position or Vector2D(0, 0)
+            self.position = position if position else Vector2D(0, 0)
             self.rotation = rotation
             self.scale = scale or Vector2D(1, 1)
         
         def initialize(self):
             pass
         
-        def move(self, direction: Vector2D):
-            """Переместить объект"""
-            self.position += direction
+        def detach(self):
+            """Открепить; позиция из строки PhysicsWorld переносится в компонент"""
+            if self._world is not None:
+                self._world.release_transform(self)
+            super().detach()
+        
+        def _on_changed(self, name):
+            """Позиция изменилась: кэшированный AABB коллайдера устарел"""
+            if self.game_object:
+                collider = self.game_object.get_component(Collider)
+                if collider and collider._bounds_cache is not None:
+                    collider._bounds_cache.mark_dirty(collider)
+        
+        def move(self, direction: Vector2D, scale: float = 1.0):
+            """Переместить объект на direction * scale"""
+            if self._world is None:
+                self._position = self._position.add_scaled(direction, scale)
+            else:
+                self._world.position[self._row] += (direction.x * scale, direction.y * scale)
+            self._on_changed('position')
         
         def rotate(self, angle: float):
             """Повернуть объект"""
@@ -724,9 +4679,23 @@ def exercise_02_game_development_framework():
             }
     
     class Rigidbody(Component):
-        """Компонент физики"""
+        """
+        Компонент физики.
+        
+        Без мира тело интегрируется само в update(). В GameSystem оно
+        подключено к PhysicsWorld: поля становятся видом на строку
+        массивов, а кадр считает PhysicsWorld.step для всех тел сразу.
+        """
+        
+        mass = RowField()
+        velocity = RowField(vector=True)
+        acceleration = RowField(vector=True)
+        drag = RowField()
+        gravity_scale = RowField()
         
         def __init__(self, mass: float = 1.0, drag: float = 0.1):
+            self._world = None
+            self._row = None
             super().__init__()
             self.mass = mass
             self.velocity = Vector2D(0, 0)
@@ -734,71 +4703,266 @@ def exercise_02_game_development_framework():
             self.drag = drag
             self.gravity_scale = 1.0
         
+        @property
+        def enabled(self):
+            return self._enabled
+        
+        @enabled.setter
+        def enabled(self, value):
+            self._enabled = value
+            if self._world is not None:
+                self._world.sync_active(self)
+        
         def initialize(self):
             pass
         
+        def detach(self):
+            """Открепить; подключённое тело освобождает строку PhysicsWorld"""
+            if self._world is not None:
+                self._world.remove(self)
+            super().detach()
+        
         def add_force(self, force: Vector2D):
             """Добавить силу"""
-            self.acceleration += force / self.mass
+            if self._world is None:
+                self.acceleration += force / self.mass
+            else:
+                delta = force / self.mass
+                self._world.acceleration[self._row] += (delta.x, delta.y)
         
         def update(self, delta_time: float):
-            """Обновить физику"""
-            if not self.enabled:
+            """Обновить физику (подключённое к миру тело считает PhysicsWorld.step)"""
+            if not self.enabled or self._world is not None:
                 return
             
-            # Применяем гравитацию
-            gravity = Vector2D(0, -9.81 * self.gravity_scale)
-            self.acceleration += gravity
+            acceleration, velocity = self._acceleration, self._velocity
             
-            # Обновляем скорость
-            self.velocity += self.acceleration * delta_time
+            # Применяем гравитацию
+            acceleration_y = acceleration.y - 9.81 * self._gravity_scale
             
-            # Применяем сопротивление
-            self.velocity *= (1.0 - self.drag * delta_time)
+            # Обновляем скорость и применяем сопротивление одним новым вектором
+            damping = 1.0 - self._drag * delta_time
+            self._velocity = velocity = Vector2D(
+                (velocity.x + acceleration.x * delta_time) * damping,
+                (velocity.y + acceleration_y * delta_time) * damping)
             
             # Обновляем позицию
             transform = self.game_object.get_component(Transform)
             if transform:
-                transform.move(self.velocity * delta_time)
+                transform.move(velocity, delta_time)
             
             # Сбрасываем ускорение
-            self.acceleration = Vector2D(0, 0)
+            self._acceleration = Vector2D(0, 0)
+    
+    class PhysicsWorld:
+        """
+        Физика тел в виде структуры массивов NumPy.
+        
+        Строка i — тело self._bodies[i]: позиция его Transform, скорость,
+        ускорение, масса, сопротивление и масштаб гравитации. step()
+        интегрирует кадр для всех тел несколькими векторными операциями
+        по той же схеме, что Rigidbody.update. Удаление переносит
+        последнюю строку на место удалённой, массивы остаются плотными.
+        collider_slot[i] — ячейка коллайдера тела в BoundsCache или -1;
+        её поддерживает BoundsCache.
+        """
+        
+        GRAVITY = 9.81
+        _VECTORS = ('position', 'velocity', 'acceleration')
+        _SCALARS = ('mass', 'drag', 'gravity_scale')
+        
+        def __init__(self, capacity: int = 64):
+            self._bodies = []  # строка -> Rigidbody
+            self._transforms = []  # строка -> Transform или None
+            for name in self._VECTORS:
+                setattr(self, name, np.zeros((capacity, 2)))
+            for name in self._SCALARS:
+                setattr(self, name, np.zeros(capacity))
+            self.active = np.zeros(capacity, dtype=bool)
+            self.collider_slot = np.full(capacity, -1, dtype=np.intp)
+            self.steps = 0  # Счётчик шагов: по нему BoundsCache видит сдвиг тел
+        
+        def _grow(self):
+            size = len(self._bodies)
+            capacity = max(2 * len(self.mass), 16)
+            for name in self._VECTORS + self._SCALARS + ('active', 'collider_slot'):
+                old = getattr(self, name)
+                new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+                new[:size] = old[:size]
+                setattr(self, name, new)
+        
+        def add(self, rigidbody: Rigidbody):
+            """Подключить тело и Transform его объекта; возвращает номер строки"""
+            if rigidbody._world is not None:
+                raise ValueError("Тело уже подключено к миру")
+            if len(self._bodies) == len(self.mass):
+                self._grow()
+            row = len(self._bodies)
+            game_object = rigidbody.game_object
+            transform = game_object.get_component(Transform) if game_object else None
+            
+            position = transform.position if transform else Vector2D(0, 0)
+            self.position[row] = (position.x, position.y)
+            self.velocity[row] = (rigidbody.velocity.x, rigidbody.velocity.y)
+            self.acceleration[row] = (rigidbody.acceleration.x, rigidbody.acceleration.y)
+            self.mass[row] = rigidbody.mass
+            self.drag[row] = rigidbody.drag
+            self.gravity_scale[row] = rigidbody.gravity_scale
+            collider = game_object.get_component(Collider) if game_object else None
+            cached = collider is not None and collider._bounds_cache is not None
+            self.collider_slot[row] = collider._slot if cached else -1
+            
+            self._bodies.append(rigidbody)
+            self._transforms.append(transform)
+            rigidbody._world, rigidbody._row = self, row
+            if transform:
+                transform._world, transform._row = self, row
+            self.sync_active(rigidbody)
+            return row
+        
+        def remove(self, rigidbody: Rigidbody):
+            """Отключить тело: значения строки возвращаются в компоненты"""
+            if rigidbody._world is not self:
+                return
+            row = rigidbody._row
+            transform = self._transforms[row]
+            for component, names in ((rigidbody, ('velocity', 'acceleration') + self._SCALARS),
+                                     (transform, ('position',))):
+                if component is None:
+                    continue
+                values = {name: getattr(component, name) for name in names}
+                component._world = component._row = None
+                for name, value in values.items():
+                    setattr(component, name, value)
+            
+            last = len(self._bodies) - 1
+            if row != last:
+                for name in self._VECTORS + self._SCALARS + ('active', 'collider_slot'):
+                    array = getattr(self, name)
+                    array[row] = array[last]
+                moved, moved_transform = self._bodies[last], self._transforms[last]
+                self._bodies[row], self._transforms[row] = moved, moved_transform
+                moved._row = row
+                if moved_transform:
+                    moved_transform._row = row
+            self.collider_slot[last] = -1
+            self._bodies.pop()
+            self._transforms.pop()
+        
+        def release_transform(self, transform: Transform):
+            """Отвязать Transform от строки его тела: позиция возвращается в компонент"""
+            if transform._world is not self:
+                return
+            row = transform._row
+            position = transform.position
+            transform._world = transform._row = None
+            transform.position = position
+            self._transforms[row] = None
+        
+        def sync_active(self, rigidbody: Rigidbody):
+            """Пересчитать флаг участия тела в step()"""
+            game_object = rigidbody.game_object
+            self.active[rigidbody._row] = (rigidbody.enabled and
+                                           (game_object is None or game_object.active))
+        
+        def step(self, delta_time: float):
+            """Интегрировать один кадр для всех активных тел"""
+            size = len(self._bodies)
+            if not size:
+                return
+            self.steps += 1
+            acceleration = self.acceleration[:size]
+            velocity = self.velocity[:size]
+            active = self.active[:size]
+            if active.all():
+                acceleration[:, 1] -= self.GRAVITY * self.gravity_scale[:size]
+                velocity += acceleration * delta_time
+                velocity *= (1.0 - self.drag[:size] * delta_time)[:, None]
+                self.position[:size] += velocity * delta_time
+                acceleration.fill(0.0)
+                return
+            # Выключенные тела и тела неактивных объектов не меняются
+            rows = np.flatnonzero(active)
+            rows_acceleration = acceleration[rows]
+            rows_acceleration[:, 1] -= self.GRAVITY * self.gravity_scale[rows]
+            rows_velocity = velocity[rows] + rows_acceleration * delta_time
+            rows_velocity *= (1.0 - self.drag[rows] * delta_time)[:, None]
+            velocity[rows] = rows_velocity
+            self.position[rows] += rows_velocity * delta_time
+            acceleration[rows] = 0.0
+        
+        def __len__(self):
+            return len(self._bodies)
     
     class Collider(Component):
-        """Компонент коллизии"""
+        """
+        Компонент коллизии.
+        
+        Коллайдер из GameSystem хранит AABB в BoundsCache и читает его
+        оттуда; без системы границы считаются по Transform при вызове.
+        """
         
         def __init__(self, width: float, height: float, is_trigger: bool = False):
+            self._bounds_cache = None  # BoundsCache и ячейка в нём
+            self._slot = None
             super().__init__()
             self.width = width
             self.height = height
             self.is_trigger = is_trigger
             self.collision_callbacks = []
         
+        @property
+        def width(self):
+            return self._width
+        
+        @width.setter
+        def width(self, value):
+            self._width = value
+            if self._bounds_cache is not None:
+                self._bounds_cache.resize(self)
+        
+        @property
+        def height(self):
+            return self._height
+        
+        @height.setter
+        def height(self, value):
+            self._height = value
+            if self._bounds_cache is not None:
+                self._bounds_cache.resize(self)
+        
         def initialize(self):
             pass
         
-        def get_bounds(self) -> Dict[str, float]:
-            """Получить границы коллайдера"""
-            transform = self.game_object.get_component(Transform)
+        def compute_aabb(self):
+            """Границы (left, bottom, right, top) по текущему Transform"""
+            transform = self.game_object.get_component(Transform) if self.game_object else None
             if transform:
                 pos = transform.position
-                return {
-                    'left': pos.x - self.width / 2,
-                    'right': pos.x + self.width / 2,
-                    'top': pos.y + self.height / 2,
-                    'bottom': pos.y - self.height / 2
-                }
-            return {'left': 0, 'right': 0, 'top': 0, 'bottom': 0}
+                return (pos.x - self.width / 2, pos.y - self.height / 2,
+                        pos.x + self.width / 2, pos.y + self.height / 2)
+            return (0, 0, 0, 0)
+        
+        def aabb(self):
+            """Границы (left, bottom, right, top), из кэша, если он есть"""
+            if self._bounds_cache is not None:
+                return self._bounds_cache.get(self)
+            return self.compute_aabb()
+        
+        def get_bounds(self) -> Dict[str, float]:
+            """Получить границы коллайдера (словарь оставлен для совместимости)"""
+            left, bottom, right, top = self.aabb()
+            return {'left': left, 'right': right, 'top': top, 'bottom': bottom}
         
         def check_collision(self, other: 'Collider') -> bool:
             """Проверить коллизию с другим коллайдером"""
-            bounds1 = self.get_bounds()
-            bounds2 = other.get_bounds()
+            left1, bottom1, right1, top1 = self.aabb()
+            left2, bottom2, right2, top2 = other.aabb()
             
-            return (bounds1['left'] < bounds2['right'] and
-                    bounds1['right'] > bounds2['left'] and
-                    bounds1['bottom'] < bounds2['top'] and
-                    bounds1['top'] > bounds2['bottom'])
+            return (left1 < right2 and
+                    right1 > left2 and
+                    bottom1 < top2 and
+                    top1 > bottom2)
         
         def add_collision_callback(self, callback):
             """Добавить callback для коллизии"""
@@ -867,30 +5031,201 @@ def exercise_02_game_development_framework():
                 'free_slots': self.inventory_size - len(self.inventory)
             }
     
+    # Хранилище компонентов по архетипам
+    class Archetype:
+        """
+        Таблица сущностей с одинаковым набором типов компонентов.
+        
+        Строка — сущность, столбец — список компонентов одного типа.
+        Удаление переносит последнюю строку на место удалённой.
+        """
+        
+        __slots__ = ('signature', 'types', 'entities', 'columns')
+        
+        def __init__(self, types: Tuple[type, ...]):
+            self.signature = frozenset(types)
+            self.types = types  # порядок столбцов — порядок первого появления набора
+            self.entities = []  # строка -> id сущности
+            self.columns = {component_type: [] for component_type in types}
+        
+        def append(self, entity: int, components: Dict[type, Component]) -> int:
+            for component_type, column in self.columns.items():
+                column.append(components[component_type])
+            self.entities.append(entity)
+            return len(self.entities) - 1
+        
+        def swap_remove(self, row: int):
+            """Убрать строку; возвращает её компоненты и id сущности, занявшей строку"""
+            last = len(self.entities) - 1
+            components = {}
+            for component_type, column in self.columns.items():
+                components[component_type] = column[row]
+                column[row] = column[last]
+                column.pop()
+            moved = self.entities[last] if row != last else None
+            self.entities[row] = self.entities[last]
+            self.entities.pop()
+            return components, moved
+        
+        def __len__(self):
+            return len(self.entities)
+    
+    class ArchetypeStore:
+        """
+        Хранилище компонентов сущностей, сгруппированных по архетипам.
+        
+        Сущности с одинаковым набором типов компонентов живут в одной
+        таблице, поэтому query() проходит по столбцам только тех
+        архетипов, где есть все запрошенные типы. Список подходящих
+        архетипов кэшируется и дополняется при появлении новых.
+        """
+        
+        def __init__(self):
+            self._archetypes = {}  # frozenset типов -> Archetype
+            self._locations = {}  # id сущности -> (Archetype, строка)
+            self._handles = {}  # id сущности -> GameObject
+            self._queries = {}  # frozenset типов -> [Archetype]
+        
+        def _archetype(self, types: Tuple[type, ...]) -> Archetype:
+            signature = frozenset(types)
+            archetype = self._archetypes.get(signature)
+            if archetype is None:
+                archetype = self._archetypes[signature] = Archetype(types)
+                for query, matches in self._queries.items():
+                    if query <= signature:
+                        matches.append(archetype)
+            return archetype
+        
+        def _place(self, entity: int, types: Tuple[type, ...], components: Dict[type, Component]):
+            archetype = self._archetype(types)
+            self._locations[entity] = (archetype, archetype.append(entity, components))
+        
+        def _take(self, entity: int):
+            """Вынуть строку сущности из её архетипа"""
+            archetype, row = self._locations.pop(entity)
+            components, moved = archetype.swap_remove(row)
+            if moved is not None:
+                self._locations[moved] = (archetype, row)
+            return archetype, components
+        
+        def add_entity(self, handle, components=()):
+            """Добавить сущность handle.id с компонентами в заданном порядке"""
+            if handle.id in self._locations:
+                raise ValueError(f"Сущность {handle.id} уже в хранилище")
+            components = list(components)
+            self._handles[handle.id] = handle
+            self._place(handle.id, tuple(type(component) for component in components),
+                        {type(component): component for component in components})
+        
+        def remove_entity(self, entity: int) -> List[Component]:
+            """Удалить сущность; возвращает её компоненты"""
+            archetype, components = self._take(entity)
+            del self._handles[entity]
+            return [components[component_type] for component_type in archetype.types]
+        
+        def adopt(self, handle):
+            """Перенести сущность из её текущего хранилища в это"""
+            if handle._store is self:
+                return
+            self.add_entity(handle, handle._store.remove_entity(handle.id))
+            handle._store = self
+        
+        def add_component(self, entity: int, component: Component):
+            component_type = type(component)
+            archetype, _ = self._locations[entity]
+            if component_type in archetype.columns:
+                raise ValueError(f"Компонент {component_type.__name__} уже добавлен")
+            archetype, components = self._take(entity)
+            components[component_type] = component
+            self._place(entity, archetype.types + (component_type,), components)
+        
+        def remove_component(self, entity: int, component_type: type):
+            archetype, _ = self._locations[entity]
+            if component_type not in archetype.columns:
+                return None
+            archetype, components = self._take(entity)
+            component = components.pop(component_type)
+            self._place(entity, tuple(t for t in archetype.types if t != component_type),
+                        components)
+            return component
+        
+        def get(self, entity: int, component_type: type):
+            archetype, row = self._locations[entity]
+            column = archetype.columns.get(component_type)
+            return column[row] if column is not None else None
+        
+        def has(self, entity: int, component_type: type) -> bool:
+            return component_type in self._locations[entity][0].columns
+        
+        def components(self, entity: int) -> List[Component]:
+            """Компоненты сущности в порядке столбцов её архетипа"""
+            archetype, row = self._locations[entity]
+            return [column[row] for column in archetype.columns.values()]
+        
+        def count(self, entity: int) -> int:
+            return len(self._locations[entity][0].types)
+        
+        def handle(self, entity: int):
+            return self._handles[entity]
+        
+        def query(self, *component_types: type):
+            """
+            Архетипы со всеми component_types: по одному кортежу
+            (id сущностей, столбец первого типа, столбец второго, ...).
+            """
+            key = frozenset(component_types)
+            matches = self._queries.get(key)
+            if matches is None:
+                matches = self._queries[key] = [archetype for signature, archetype
+                                                in self._archetypes.items() if key <= signature]
+            for archetype in matches:
+                if archetype.entities:
+                    yield (archetype.entities,) + tuple(archetype.columns[component_type]
+                                                        for component_type in component_types)
+        
+        def archetypes(self):
+            """Непустые архетипы"""
+            return [archetype for archetype in self._archetypes.values() if archetype.entities]
+        
+        def __len__(self):
+            return len(self._locations)
+    
     # Главный класс игрового объекта
     class GameObject:
-        """Игровой объект"""
+        """
+        Игровой объект — дескриптор сущности в ArchetypeStore.
+        
+        Компоненты хранятся не в объекте, а в строке архетипа хранилища
+        по self.id. Новый объект получает собственное хранилище;
+        GameSystem переносит его в общее хранилище системы.
+        """
         
         _id_counter = 0
         
-        def __init__(self, name: str):
+        def __init__(self, name: str, **kwargs):
+            super().__init__(**kwargs)  # Кооперативно: параметры миксинов здоровья и инвентаря
             GameObject._id_counter += 1
             self.id = GameObject._id_counter
             self.name = name
-            self.active = True
+            self._active = True
             self.tag = ""
-            self._components = {}
-            self._component_instances = []
+            self._store = ArchetypeStore()
+            self._store.add_entity(self)
+        
+        @property
+        def active(self):
+            return self._active
+        
+        @active.setter
+        def active(self, value):
+            self._active = value
+            rigidbody = self.get_component(Rigidbody)
+            if rigidbody and rigidbody._world is not None:
+                rigidbody._world.sync_active(rigidbody)
         
         def add_component(self, component: Component):
             """Добавить компонент"""
-            component_type = type(component)
-            
-            if component_type in self._components:
-                raise ValueError(f"Компонент {component_type.__name__} уже добавлен")
-            
-            self._components[component_type] = component
-            self._component_instances.append(component)
+            self._store.add_component(self.id, component)
             component.attach_to(self)
             component.initialize()
             
@@ -898,32 +5233,29 @@ def exercise_02_game_development_framework():
         
         def remove_component(self, component_type: Type[Component]):
             """Удалить компонент"""
-            component = self._components.get(component_type)
+            component = self._store.remove_component(self.id, component_type)
             if component:
                 component.detach()
-                del self._components[component_type]
-                self._component_instances.remove(component)
-                return component
-            return None
+            return component
         
         def get_component(self, component_type: Type[Component]):
             """Получить компонент"""
-            return self._components.get(component_type)
+            return self._store.get(self.id, component_type)
         
         def has_component(self, component_type: Type[Component]) -> bool:
             """Проверить наличие компонента"""
-            return component_type in self._components
+            return self._store.has(self.id, component_type)
         
         def get_all_components(self):
             """Получить все компоненты"""
-            return self._component_instances.copy()
+            return self._store.components(self.id)
         
         def update(self, delta_time: float):
             """Обновить объект"""
             if not self.active:
                 return
             
-            for component in self._component_instances:
+            for component in self._store.components(self.id):
                 if isinstance(component, Updatable) and component.enabled:
                     component.update(delta_time)
         
@@ -938,7 +5270,7 @@ def exercise_02_game_development_framework():
             return f"GameObject '{self.name}' (без рендерера)"
         
         def __str__(self):
-            return f"GameObject(id={self.id}, name='{self.name}', components={len(self._components)})"
+            return f"GameObject(id={self.id}, name='{self.name}', components={len(self)})"
         
         def __repr__(self):
             return f"GameObject({self.id}, '{self.name}')"
@@ -953,11 +5285,11 @@ def exercise_02_game_development_framework():
         
         def __iter__(self):
             """Итерация по компонентам"""
-            return iter(self._component_instances)
+            return iter(self._store.components(self.id))
         
         def __len__(self):
             """Количество компонентов"""
-            return len(self._component_instances)
+            return self._store.count(self.id)
     
     # Специализированные игровые объекты
     class Player(GameObject, HealthMixin, InventoryMixin):
@@ -1027,23 +5359,232 @@ def exercise_02_game_development_framework():
                 force = direction * self.speed
                 rigidbody.add_force(force)
     
+    class SpatialHash:
+        """
+        Широкая фаза коллизий на равномерной сетке.
+        
+        Коллайдер записывается во все ячейки, которые пересекает его AABB;
+        кандидаты — пары, делящие ячейку. Пара, общая для нескольких
+        ячеек, выдаётся только в первой общей ячейке, поэтому каждая
+        проверяется один раз без множества уже виденных пар. Ячейки
+        коллайдера меняются, только когда он переходит в другие ячейки.
+        """
+        
+        def __init__(self, cell_size: float = 64.0):
+            if cell_size <= 0:
+                raise ValueError("Размер ячейки должен быть положительным")
+            self.cell_size = cell_size
+            self._cells = {}  # (cx, cy) -> {collider: None}
+            self._ranges = {}  # collider -> (x0, y0, x1, y1) занятых ячеек
+        
+        def _cell_range(self, collider):
+            left, bottom, right, top = collider.aabb()
+            size = self.cell_size
+            return (int(left // size), int(bottom // size),
+                    int(right // size), int(top // size))
+        
+        def _store(self, collider, cell_range):
+            x0, y0, x1, y1 = cell_range
+            for cx in range(x0, x1 + 1):
+                for cy in range(y0, y1 + 1):
+                    self._cells.setdefault((cx, cy), {})[collider] = None
+            self._ranges[collider] = cell_range
+        
+        def remove(self, collider):
+            """Убрать коллайдер из сетки"""
+            cell_range = self._ranges.pop(collider, None)
+            if cell_range is None:
+                return
+            x0, y0, x1, y1 = cell_range
+            for cx in range(x0, x1 + 1):
+                for cy in range(y0, y1 + 1):
+                    cell = self._cells[(cx, cy)]
+                    del cell[collider]
+                    if not cell:
+                        del self._cells[(cx, cy)]
+        
+        def update(self, colliders, bounds=None):
+            """
+            Обновить ячейки по текущим позициям; возвращает число переставленных.
+            
+            bounds — необязательный массив (n, 4) границ в порядке colliders,
+            тогда ячейки всех коллайдеров считаются одной операцией.
+            """
+            if bounds is None:
+                cell_ranges = map(self._cell_range, colliders)
+            else:
+                cell_ranges = map(tuple, np.floor_divide(bounds, self.cell_size)
+                                  .astype(np.int64).tolist())
+            moved = 0
+            for collider, cell_range in zip(colliders, cell_ranges):
+                if self._ranges.get(collider) != cell_range:
+                    self.remove(collider)
+                    self._store(collider, cell_range)
+                    moved += 1
+            return moved
+        
+        def candidate_pairs(self):
+            """Пары коллайдеров из общих ячеек, каждая ровно один раз"""
+            ranges = self._ranges
+            for (cx, cy), cell in self._cells.items():
+                if len(cell) < 2:
+                    continue
+                members = list(cell)
+                for i, first in enumerate(members):
+                    first_range = ranges[first]
+                    for j in range(i + 1, len(members)):
+                        second = members[j]
+                        second_range = ranges[second]
+                        # Первая общая ячейка пары — максимум нижних левых углов
+                        if (cx == max(first_range[0], second_range[0])
+                                and cy == max(first_range[1], second_range[1])):
+                            yield first, second
+        
+        def __len__(self):
+            """Количество непустых ячеек"""
+            return len(self._cells)
+    
+    class BoundsCache:
+        """
+        AABB коллайдеров в упакованном массиве (n, 4): left, bottom, right, top.
+        
+        Ячейка помечается грязной, когда меняется позиция Transform или
+        размер коллайдера. refresh() пересчитывает границы раз в кадр:
+        тела PhysicsWorld — векторно по массиву позиций после каждого
+        шага, остальные грязные ячейки — по одной. Удаление переносит
+        последнюю ячейку на место удалённой.
+        """
+        
+        def __init__(self, physics: PhysicsWorld = None, capacity: int = 64):
+            self.physics = physics
+            self.colliders = []  # ячейка -> Collider
+            self.bounds = np.zeros((capacity, 4))
+            self.half = np.zeros((capacity, 2))  # половины ширины и высоты
+            self.dirty = np.zeros(capacity, dtype=bool)
+            self._any_dirty = False
+            self._synced_step = -1
+        
+        def _grow(self):
+            size = len(self.colliders)
+            capacity = max(2 * len(self.dirty), 16)
+            for name in ('bounds', 'half', 'dirty'):
+                old = getattr(self, name)
+                new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+                new[:size] = old[:size]
+                setattr(self, name, new)
+        
+        def _physics_row(self, collider):
+            transform = collider.game_object.get_component(Transform) if collider.game_object else None
+            if transform and self.physics is not None and transform._world is self.physics:
+                return transform._row
+            return None
+        
+        def add(self, collider: Collider):
+            """Добавить коллайдер; возвращает номер ячейки"""
+            if collider._bounds_cache is not None:
+                raise ValueError("Коллайдер уже в кэше границ")
+            if len(self.colliders) == len(self.dirty):
+                self._grow()
+            slot = len(self.colliders)
+            self.colliders.append(collider)
+            collider._bounds_cache, collider._slot = self, slot
+            self.resize(collider)
+            row = self._physics_row(collider)
+            if row is not None:
+                self.physics.collider_slot[row] = slot
+            return slot
+        
+        def remove(self, collider: Collider):
+            """Убрать коллайдер из кэша"""
+            if collider._bounds_cache is not self:
+                return
+            slot = collider._slot
+            row = self._physics_row(collider)
+            if row is not None:
+                self.physics.collider_slot[row] = -1
+            collider._bounds_cache = collider._slot = None
+            
+            last = len(self.colliders) - 1
+            if slot != last:
+                for array in (self.bounds, self.half, self.dirty):
+                    array[slot] = array[last]
+                moved = self.colliders[last]
+                self.colliders[slot] = moved
+                moved._slot = slot
+                row = self._physics_row(moved)
+                if row is not None:
+                    self.physics.collider_slot[row] = slot
+            self.colliders.pop()
+            self.dirty[last] = False
+        
+        def resize(self, collider: Collider):
+            """Размер коллайдера изменился"""
+            self.half[collider._slot] = (collider.width / 2, collider.height / 2)
+            self.mark_dirty(collider)
+        
+        def mark_dirty(self, collider: Collider):
+            self.dirty[collider._slot] = True
+            self._any_dirty = True
+        
+        def refresh(self):
+            """Пересчитать устаревшие границы; возвращает массив (n, 4)"""
+            size = len(self.colliders)
+            physics = self.physics
+            if physics is not None and physics.steps != self._synced_step:
+                # После шага физики сдвинулись все тела мира
+                slots = physics.collider_slot[:len(physics)]
+                rows = np.flatnonzero(slots >= 0)
+                slots = slots[rows]
+                positions = physics.position[rows]
+                half = self.half[slots]
+                self.bounds[slots, :2] = positions - half
+                self.bounds[slots, 2:] = positions + half
+                self._synced_step = physics.steps
+            if self._any_dirty:
+                for slot in np.flatnonzero(self.dirty[:size]).tolist():
+                    self.bounds[slot] = self.colliders[slot].compute_aabb()
+                self.dirty[:size] = False
+                self._any_dirty = False
+            return self.bounds[:size]
+        
+        def get(self, collider: Collider):
+            """Границы одного коллайдера (left, bottom, right, top)"""
+            if self._any_dirty or (self.physics is not None
+                                   and self.physics.steps != self._synced_step):
+                self.refresh()
+            return tuple(self.bounds[collider._slot].tolist())
+        
+        def __len__(self):
+            return len(self.colliders)
+    
     # Система управления игрой
     class GameSystem:
         """Система управления игрой"""
         
-        def __init__(self):
+        def __init__(self, cell_size: float = 64.0):
             self.game_objects = []
-            self._colliders = []
+            self.store = ArchetypeStore()  # Компоненты всех объектов системы
+            self._broad_phase = SpatialHash(cell_size)
+            self.physics = PhysicsWorld()
+            self._bounds = BoundsCache(self.physics)
+            self._colliders = self._bounds.colliders  # в порядке ячеек кэша границ
+            self.frame_stats = deque(maxlen=600)  # Статистика коллизий последних кадров
             self.running = False
         
         def add_game_object(self, game_object: GameObject):
             """Добавить игровой объект"""
             self.game_objects.append(game_object)
+            self.store.adopt(game_object)
             
             # Регистрируем коллайдеры
             collider = game_object.get_component(Collider)
             if collider:
-                self._colliders.append(collider)
+                self._bounds.add(collider)
+            
+            # Физика объекта считается пакетно в PhysicsWorld
+            rigidbody = game_object.get_component(Rigidbody)
+            if rigidbody:
+                self.physics.add(rigidbody)
         
         def remove_game_object(self, game_object: GameObject):
             """Удалить игровой объект"""
@@ -1052,31 +5593,73 @@ def exercise_02_game_development_framework():
                 
                 collider = game_object.get_component(Collider)
                 if collider in self._colliders:
-                    self._colliders.remove(collider)
+                    self._bounds.remove(collider)
+                    self._broad_phase.remove(collider)
+                
+                rigidbody = game_object.get_component(Rigidbody)
+                if rigidbody:
+                    self.physics.remove(rigidbody)
+                
+                ArchetypeStore().adopt(game_object)
         
         def update(self, delta_time: float):
             """Обновить все объекты"""
-            # Обновляем объекты
-            for obj in self.game_objects:
-                obj.update(delta_time)
-                
-                # Специальная логика для врагов
-                if isinstance(obj, Enemy) and obj.is_alive:
-                    player = self.find_object_by_type(Player)
-                    if player:
-                        player_transform = player.get_component(Transform)
-                        if player_transform:
-                            obj.ai_update(delta_time, player_transform.position)
+            # Физика всех тел за один шаг; силы ИИ ниже действуют со следующего кадра
+            self.physics.step(delta_time)
+            
+            # Обновляем компоненты по столбцам архетипов
+            handle = self.store.handle
+            for archetype in self.store.archetypes():
+                for component_type, column in archetype.columns.items():
+                    if not issubclass(component_type, Updatable):
+                        continue
+                    world_backed = component_type is Rigidbody
+                    for entity, component in zip(archetype.entities, column):
+                        if world_backed and component._world is not None:
+                            continue  # Уже проинтегрировано в physics.step
+                        if component.enabled and handle(entity).active:
+                            component.update(delta_time)
+            
+            # Специальная логика для врагов
+            player = self.find_object_by_type(Player)
+            player_transform = player.get_component(Transform) if player else None
+            if player_transform:
+                for obj in self.game_objects:
+                    if isinstance(obj, Enemy) and obj.is_alive:
+                        obj.ai_update(delta_time, player_transform.position)
             
             # Проверяем коллизии
             self.check_collisions()
         
         def check_collisions(self):
-            """Проверить коллизии"""
-            for i, collider1 in enumerate(self._colliders):
-                for collider2 in self._colliders[i + 1:]:
-                    if collider1.check_collision(collider2):
-                        self.handle_collision(collider1, collider2)
+            """
+            Проверить коллизии.
+            
+            Кэш границ обновляется раз в кадр, сетка строится по нему, а
+            точная проверка AABB выполняется векторно для пар из общих
+            ячеек. Число кандидатов и коллизий кадра добавляется в frame_stats.
+            """
+            bounds = self._bounds.refresh()
+            moved = self._broad_phase.update(self._colliders, bounds)
+            pairs = list(self._broad_phase.candidate_pairs())
+            candidates = len(pairs)
+            collisions = 0
+            if pairs:
+                slots = np.array([(first._slot, second._slot) for first, second in pairs],
+                                 dtype=np.intp)
+                first, second = bounds[slots[:, 0]], bounds[slots[:, 1]]
+                hits = ((first[:, 0] < second[:, 2]) & (first[:, 2] > second[:, 0]) &
+                        (first[:, 1] < second[:, 3]) & (first[:, 3] > second[:, 1]))
+                for index in np.flatnonzero(hits).tolist():
+                    collisions += 1
+                    self.handle_collision(*pairs[index])
+            self.frame_stats.append({
+                'colliders': len(self._colliders),
+                'moved': moved,
+                'candidate_pairs': candidates,
+                'collisions': collisions
+            })
+            return collisions
         
         def handle_collision(self, collider1: Collider, collider2: Collider):
             """Обработать коллизию"""
@@ -1090,23 +5673,18 @@ def exercise_02_game_development_framework():
                 callback(obj1)
         
         def render(self):
-            """Отрисовать все объекты"""
-            drawable_objects = []
-            
-            for obj in self.game_objects:
-                if isinstance(obj, Drawable) or obj.has_component(Renderer):
-                    drawable_objects.append(obj)
+            """Отрисовать все объекты с Renderer, по слоям"""
+            renderers = []
+            for entities, column in self.store.query(Renderer):
+                renderers.extend(renderer for entity, renderer in zip(entities, column)
+                                 if self.store.handle(entity).active)
             
             # Сортируем по слоям
-            drawable_objects.sort(key=lambda obj: (
-                obj.get_component(Renderer).layer 
-                if obj.has_component(Renderer) 
-                else 0
-            ))
+            renderers.sort(key=lambda renderer: renderer.layer)
             
             print("=== Кадр отрисовки ===")
-            for obj in drawable_objects:
-                result = obj.draw()
+            for renderer in renderers:
+                result = renderer.draw()
                 if result:
                     print(result)
         
@@ -1132,15 +5710,165 @@ def exercise_02_game_development_framework():
             """Статистика игры"""
             total_objects = len(self.game_objects)
             active_objects = sum(1 for obj in self.game_objects if obj.active)
-            components_count = sum(len(obj) for obj in self.game_objects)
+            components_count = sum(len(archetype) * len(archetype.types)
+                                   for archetype in self.store.archetypes())
             
             return {
                 'total_objects': total_objects,
                 'active_objects': active_objects,
                 'components_count': components_count,
-                'colliders_count': len(self._colliders)
+                'colliders_count': len(self._colliders),
+                'candidate_pairs': self.frame_stats[-1]['candidate_pairs'] if self.frame_stats else 0
             }
     
+    def run_collision_benchmark(counts=(1000, 5000, 20000), frames=3, world_size=8000.0,
+                                naive_limit=2000, seed=21):
+        """
+        Время проверки коллизий на случайной сцене.
+        
+        Коллайдеры 16–48 единиц разбросаны по квадрату world_size и
+        смещаются между кадрами. Перебор всех пар измеряется только до
+        naive_limit коллайдеров — дальше он занимает минуты.
+        """
+        rng = random.Random(seed)
+        results = {}
+        for count in counts:
+            scene = GameSystem(cell_size=64.0)
+            for index in range(count):
+                obj = GameObject(f"Тело {index}")
+                obj.add_component(Transform(Vector2D(rng.uniform(0, world_size),
+                                                     rng.uniform(0, world_size))))
+                obj.add_component(Collider(rng.uniform(16, 48), rng.uniform(16, 48)))
+                scene.add_game_object(obj)
+            
+            elapsed = 0.0
+            for _ in range(frames):
+                for obj in scene.game_objects:
+                    obj.get_component(Transform).move(Vector2D(rng.uniform(-4, 4),
+                                                               rng.uniform(-4, 4)))
+                started = time.perf_counter()
+                scene.check_collisions()
+                elapsed += time.perf_counter() - started
+            grid_ms = elapsed / frames * 1000
+            last = scene.frame_stats[-1]
+            
+            naive_ms = None
+            if count <= naive_limit:
+                colliders = scene._colliders
+                started = time.perf_counter()
+                naive_hits = sum(1 for i, first in enumerate(colliders)
+                                 for second in colliders[i + 1:] if first.check_collision(second))
+                naive_ms = (time.perf_counter() - started) * 1000
+                if naive_hits != last['collisions']:
+                    raise RuntimeError("Широкая фаза пропустила коллизии")
+            
+            results[count] = {'grid_ms': grid_ms, 'naive_ms': naive_ms, **last}
+            naive = f"{naive_ms:8.1f} мс" if naive_ms is not None else "       —   "
+            print(f"  Коллайдеров: {count:>6}, пар всего: {count * (count - 1) // 2:>11,}, "
+                  f"кандидатов: {last['candidate_pairs']:>6}, коллизий: {last['collisions']:>5}, "
+                  f"сетка: {grid_ms:7.1f} мс/кадр, перебор: {naive}")
+        return results
+    
+    def run_physics_benchmark(counts=(1000, 10000, 50000), frames=10, seed=22):
+        """
+        Покадровая интеграция Rigidbody.update против PhysicsWorld.step.
+        
+        Обе сцены получают одинаковые тела и силы; после прогона
+        позиции сверяются, чтобы пакетный шаг считал то же самое.
+        """
+        delta_time = 0.016
+        results = {}
+        for count in counts:
+            rng = random.Random(seed)
+            scenes = ([], PhysicsWorld())
+            for index in range(count):
+                position = Vector2D(rng.uniform(-500, 500), rng.uniform(-500, 500))
+                mass, drag = rng.uniform(1, 100), rng.uniform(0.0, 0.5)
+                for scene in scenes:
+                    obj = GameObject(f"Тело {index}")
+                    obj.add_component(Transform(position))
+                    body = obj.add_component(Rigidbody(mass=mass, drag=drag))
+                    body.add_force(Vector2D(mass * 10, 0))
+                    if isinstance(scene, PhysicsWorld):
+                        scene.add(body)
+                    else:
+                        scene.append(obj)
+            objects, world = scenes
+            
+            started = time.perf_counter()
+            for _ in range(frames):
+                for obj in objects:
+                    obj.update(delta_time)
+            per_object_ms = (time.perf_counter() - started) / frames * 1000
+            
+            started = time.perf_counter()
+            for _ in range(frames):
+                world.step(delta_time)
+            batched_ms = (time.perf_counter() - started) / frames * 1000
+            
+            expected = np.array([[obj.get_component(Transform).position.x,
+                                  obj.get_component(Transform).position.y] for obj in objects])
+            if not np.allclose(expected, world.position[:count]):
+                raise RuntimeError("PhysicsWorld.step расходится с Rigidbody.update")
+            
+            results[count] = {'per_object_ms': per_object_ms, 'batched_ms': batched_ms}
+            print(f"  Тел: {count:>6}, Rigidbody.update: {per_object_ms:8.2f} мс/кадр, "
+                  f"PhysicsWorld.step: {batched_ms:6.3f} мс/кадр "
+                  f"(x{per_object_ms / batched_ms:.0f})")
+        return results
+    
+    def run_vector_benchmark(count=100000, repeats=5, seed=24):
+        """
+        Шаг p += v * dt тремя способами: операторы с промежуточным
+        вектором, add_scaled() с одним новым вектором и один вызов
+        Vector2DArray.iadd() на весь пакет.
+        Отдельно — память на count экземпляров Vector2D.
+        """
+        rng = random.Random(seed)
+        coords = [(rng.uniform(-100, 100), rng.uniform(-100, 100)) for _ in range(count)]
+        dt = 0.016
+        
+        def best(step):
+            timings = []
+            for _ in range(repeats):
+                started = time.perf_counter()
+                step()
+                timings.append(time.perf_counter() - started)
+            return min(timings) * 1000
+        
+        positions = [Vector2D(x, y) for x, y in coords]
+        velocities = [Vector2D(y, x) for x, y in coords]
+        
+        def allocating():
+            for index, velocity in enumerate(velocities):
+                positions[index] = positions[index] + velocity * dt
+        
+        def fused():
+            for index, velocity in enumerate(velocities):
+                positions[index] = positions[index].add_scaled(velocity, dt)
+        
+        batch_positions = Vector2DArray.from_vectors(positions)
+        batch_velocities = Vector2DArray.from_vectors(velocities)
+        
+        results = {
+            'operators_ms': best(allocating),
+            'add_scaled_ms': best(fused),
+            'array_ms': best(lambda: batch_positions.iadd(batch_velocities, dt)),
+        }
+        
+        tracemalloc.start()
+        vectors = [Vector2D(x, y) for x, y in coords]
+        results['bytes_per_vector'] = tracemalloc.get_traced_memory()[0] / count
+        tracemalloc.stop()
+        del vectors
+        
+        print(f"  {count} векторов, p += v * dt:")
+        print(f"    операторы (два объекта):   {results['operators_ms']:7.2f} мс")
+        print(f"    Vector2D.add_scaled:       {results['add_scaled_ms']:7.2f} мс")
+        print(f"    Vector2DArray.iadd:        {results['array_ms']:7.3f} мс")
+        print(f"  Память на Vector2D со __slots__: {results['bytes_per_vector']:.0f} байт")
+        return results
+    
     # Тестирование игрового фреймворка
     print("1. Зарегистрированные компоненты:")
     print(f"Компоненты: {ComponentMeta.list_components()}")
@@ -1225,6 +5953,58 @@ def exercise_02_game_development_framework():
     print(f"Активных объектов: {stats['active_objects']}")
     print(f"Компонентов: {stats['components_count']}")
     print(f"Коллайдеров: {stats['colliders_count']}")
+    print(f"Пар-кандидатов в последнем кадре: {stats['candidate_pairs']}")
+    
+    print("\n8. Широкая фаза коллизий:")
+    
+    run_collision_benchmark(counts=(200, 1000), frames=2, world_size=2000.0, naive_limit=200)
+    
+    print("\n9. Пакетная физика:")
+    
+    print(f"Тел в PhysicsWorld: {len(game_system.physics)}")
+    player_body = player.get_component(Rigidbody)
+    print(f"Скорость игрока из строки массива: {player_body.velocity}")
+    try:
+        player_body.velocity.x += 1
+    except AttributeError:
+        print("Поле-вектор меняется только присваиванием: velocity.x += 1 запрещено")
+    player_body.velocity += Vector2D(1, 0)
+    print(f"После velocity += (1, 0): {player_body.velocity}")
+    run_physics_benchmark(counts=(200, 1000), frames=3)
+    
+    print("\n10. Векторы и пакеты векторов:")
+    
+    step = Vector2D(1, 2).add_scaled(Vector2D(3, 4), 0.5) * 2
+    print(f"(1, 2) + (3, 4) * 0.5, затем * 2: {step}")
+    print(f"Вектор как ключ словаря: {({step: 'точка'})[Vector2D(5, 8)]}")
+    batch = Vector2DArray.from_vectors([Vector2D(3, 4), Vector2D(0, 0), Vector2D(-6, 8)])
+    print(f"{batch}, длины: {batch.magnitude().tolist()}")
+    print(f"Нормализованные: {', '.join(str(vector) for vector in batch.normalize())}")
+    run_vector_benchmark(count=10000, repeats=3)
+    
+    print("\n11. Архетипы компонентов:")
+    
+    marker = GameObject("Маркер")
+    marker.add_component(Transform(Vector2D(10, 10)))
+    marker.add_component(Renderer("flag_sprite", "yellow", layer=1))
+    game_system.add_game_object(marker)
+    for archetype in game_system.store.archetypes():
+        names = ', '.join(component_type.__name__ for component_type in archetype.types)
+        print(f"[{names}]: {len(archetype)} сущн.")
+    moving = sum(len(entities) for entities, _, _ in game_system.store.query(Transform, Rigidbody))
+    print(f"Сущностей с Transform + Rigidbody: {moving}")
+    marker.remove_component(Renderer)
+    print(f"После удаления Renderer у маркера: {marker}, архетипов: {len(game_system.store.archetypes())}")
+    
+    if run_benchmarks:
+        print("\n12. Замеры производительности:")
+        
+        print("Коллизии:")
+        run_collision_benchmark()
+        print("Физика:")
+        run_physics_benchmark()
+        print("Векторы:")
+        run_vector_benchmark()
     
     print("\n✅ Упражнение 2 завершено!")
 
@@ -1813,10 +6593,16 @@ def exercise_03_design_patterns_showcase():
 def main():
     """
     Главная функция для запуска всех упражнений
+    
+    С флагом --benchmark упражнения дополнительно выполняют полные
+    замеры производительности.
     """
+    run_benchmarks = "--benchmark" in sys.argv[1:]
     exercises = [
-        ("Система управления библиотекой", exercise_01_library_management_system),
-        ("Фреймворк для разработки игр", exercise_02_game_development_framework),
+        ("Система управления библиотекой",
+         functools.partial(exercise_01_library_management_system, run_benchmarks=run_benchmarks)),
+        ("Фреймворк для разработки игр",
+         functools.partial(exercise_02_game_development_framework, run_benchmarks=run_benchmarks)),
         ("Демонстрация паттернов проектирования", exercise_03_design_patterns_showcase),
     ]
     